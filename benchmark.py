@@ -0,0 +1,310 @@
+"""
+离线 LPR 流水线基准测试。
+
+把一个目录中的录制帧 (jpg/png) 或一个视频文件按顺序回放，逐阶段调用与
+main.py 相同的代码，统计每个阶段的 p50/p95/p99 延迟、整体帧率和峰值 RSS。
+开门使用 FakeGarageController，完全离线运行，不会连接 Meross 云端。
+模型在计时开始之前加载并按回放分辨率预热，统计结果不包含冷启动。
+
+用法:
+    python benchmark.py recordings/ --whitelist 1SB3HM,ABC123
+    python benchmark.py driveway.mp4 --max-frames 300 --rotation none --json bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+import cv2
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+STAGES = [
+    "decode",
+    "rotate",
+    "coco_model",
+    "license_plate_detector",
+    "threshold",
+    "read_license_plate",
+    "is_string_similar_to_any_in_list",
+    "open_garage_door",
+]
+
+
+class FakeGarageController:
+    """替代 MerossGarageController 的离线控制器，可模拟云端往返延迟。"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.open_count = 0
+        self.is_ready = True
+
+    async def initialize(self) -> bool:
+        return True
+
+    def can_open_door(self) -> bool:
+        return True
+
+    async def open_door(self) -> bool:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        self.open_count += 1
+        return True
+
+    def request_reconnect(self):
+        pass
+
+    async def close_connection(self):
+        pass
+
+
+class StageTimer:
+    """按阶段收集耗时 (秒)。"""
+
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+
+    @contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+
+
+def percentile(values, q: float) -> float:
+    """线性插值的百分位数，q 取 0-100。"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def peak_rss_mb() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return usage / (1024.0 * 1024.0) if sys.platform == "darwin" else usage / 1024.0
+
+
+def iter_frames(source: str, max_frames: int, timer: StageTimer):
+    """按顺序产出帧，解码耗时计入 decode 阶段。"""
+    if os.path.isdir(source):
+        paths = sorted(
+            os.path.join(source, name)
+            for name in os.listdir(source)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        for path in paths[:max_frames] if max_frames else paths:
+            with timer.measure("decode"):
+                frame = cv2.imread(path)
+            if frame is not None:
+                yield frame
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise SystemExit(f"错误: 无法打开视频文件 {source}")
+    count = 0
+    try:
+        while not max_frames or count < max_frames:
+            with timer.measure("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+            count += 1
+            yield frame
+    finally:
+        cap.release()
+
+
+def probe_frame_size(source: str):
+    """读取第一帧的 (宽, 高)，不计时；读不到时返回 (0, 0)。"""
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                frame = cv2.imread(os.path.join(source, name))
+                if frame is not None:
+                    return frame.shape[1], frame.shape[0]
+        return 0, 0
+    cap = cv2.VideoCapture(source)
+    try:
+        ret, frame = cap.read()
+    finally:
+        cap.release()
+    return (frame.shape[1], frame.shape[0]) if ret else (0, 0)
+
+
+async def run_benchmark(args) -> dict:
+    # 为 open_garage_door() 提供假凭据，控制器替换为离线实现
+    os.environ.setdefault("MEROSS_EMAIL", "benchmark@example.com")
+    os.environ.setdefault("MEROSS_PASSWORD", "benchmark")
+    os.environ.setdefault("MEROSS_GARAGE_DOOR_NAME", "benchmark")
+
+    import main as lpr
+    from cameras import ROTATIONS, parse_roi, roi_to_pixels
+    from util import PlateWhitelistIndex, is_string_similar_to_any_in_list, read_license_plate
+
+    fake_controller = FakeGarageController(latency=args.door_latency)
+    lpr._controller = fake_controller
+    # 单路回放没有可合批的其他摄像头，不等待批量窗口，只测模型本身
+    lpr.vehicle_detection_service.max_wait = 0
+    lpr.plate_detection_service.max_wait = 0
+    whitelist = [plate for plate in (args.whitelist or "").split(",") if plate]
+    matcher = PlateWhitelistIndex(whitelist)
+    rotate_code = ROTATIONS[args.rotation]
+    roi = parse_roi(args.roi)
+    # 与 main.py 相同的输入尺寸调度 (LPR_DYNAMIC_IMGSZ / LPR_VEHICLE_IMGSZ / ...)
+    resolution = lpr.create_resolution_scheduler()
+
+    # 计时之前加载 (必要时导出) 全部模型，并按回放的实际分辨率预热，
+    # 第一帧的样本不再包含模型加载和冷启动推理
+    await asyncio.get_running_loop().run_in_executor(None, lpr.load_models)
+    frame_width, frame_height = probe_frame_size(args.source)
+    if roi is not None and frame_width > 0 and frame_height > 0:
+        x1, y1, x2, y2 = roi_to_pixels(roi, frame_width, frame_height)
+        frame_width, frame_height = x2 - x1, y2 - y1
+    await lpr.warmup_models(frame_width, frame_height, rotate_code)
+
+    timer = StageTimer()
+    frames = 0
+    plates_read = 0
+    doors_opened = 0
+    started = time.perf_counter()
+
+    for frame in iter_frames(args.source, args.max_frames, timer):
+        frames += 1
+        with timer.measure("rotate"):
+            frame = lpr.rotate_frame(lpr.crop_roi(frame, roi)[0], rotate_code)
+
+        with timer.measure("coco_model"):
+            detections = lpr.predict_vehicle_boxes([frame], **resolution.vehicle_args())[0]
+        vehicle_boxes = [
+            [x1, y1, x2, y2, score]
+            for x1, y1, x2, y2, score, class_id in detections
+            if int(class_id) in lpr.vehicles
+        ]
+        resolution.report_vehicle_boxes(vehicle_boxes, frame.shape[1], frame.shape[0])
+
+        if args.cascade and not vehicle_boxes:
+            continue
+        with timer.measure("license_plate_detector"):
+            if args.cascade:
+                plate_boxes = await lpr.detect_plates_in_vehicles(
+                    frame, vehicle_boxes, **resolution.plate_args()
+                )
+            else:
+                plate_boxes = lpr.predict_plate_boxes([frame], **resolution.plate_args())[0]
+
+        for x1, y1, x2, y2, _, _ in plate_boxes:
+            with timer.measure("threshold"):
+                crop = frame[int(y1) : int(y2), int(x1) : int(x2), :]
+                gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+                _, crop_thresh = cv2.threshold(gray, 64, 255, cv2.THRESH_BINARY_INV)
+
+            with timer.measure("read_license_plate"):
+                text, _ = read_license_plate(crop_thresh)
+            if text is None:
+                continue
+            plates_read += 1
+
+            with timer.measure("is_string_similar_to_any_in_list"):
+                matched = is_string_similar_to_any_in_list(
+                    text, matcher, lpr.WHITELIST_CONFIDENCE_PERCENT
+                )
+            if matched:
+                # FakeGarageController 没有冷却时间，测量的是开门路径本身的开销
+                with timer.measure("open_garage_door"):
+                    if await lpr.open_garage_door() == 1:
+                        doors_opened += 1
+
+    elapsed = time.perf_counter() - started
+    await lpr.plate_detection_service.stop()
+
+    report = {
+        "source": args.source,
+        "frames": frames,
+        "plates_read": plates_read,
+        "doors_opened": doors_opened,
+        "elapsed_seconds": elapsed,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": {},
+    }
+    for stage, samples in timer.samples.items():
+        report["stages"][stage] = {
+            "count": len(samples),
+            "p50_ms": percentile(samples, 50) * 1000,
+            "p95_ms": percentile(samples, 95) * 1000,
+            "p99_ms": percentile(samples, 99) * 1000,
+            "total_ms": sum(samples) * 1000,
+        }
+    return report
+
+
+def print_report(report: dict):
+    print()
+    print(f"{'stage':<36}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, stats in report["stages"].items():
+        print(
+            f"{stage:<36}{stats['count']:>8}{stats['p50_ms']:>10.2f}"
+            f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+        )
+    print()
+    print(
+        f"帧数: {report['frames']}  车牌: {report['plates_read']}  "
+        f"开门: {report['doors_opened']}"
+    )
+    print(f"吞吐: {report['fps']:.2f} FPS  峰值 RSS: {report['peak_rss_mb']:.1f} MB")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="离线 LPR 流水线基准测试")
+    parser.add_argument("source", help="录制帧目录 (jpg/png) 或视频文件")
+    parser.add_argument("--max-frames", type=int, default=0, help="最多回放的帧数 (0 表示全部)")
+    parser.add_argument(
+        "--rotation",
+        default="90_cw",
+        choices=["none", "90_cw", "90_ccw", "180"],
+        help="与摄像头配置相同的画面旋转",
+    )
+    parser.add_argument(
+        "--roi", default=None, help="感兴趣区域 x,y,w,h (源画面坐标，与 LPR_ROI 相同)"
+    )
+    parser.add_argument("--whitelist", default="", help="逗号分隔的白名单车牌")
+    parser.add_argument(
+        "--no-cascade",
+        dest="cascade",
+        action="store_false",
+        help="在整帧上运行车牌检测器，而不是只在车辆区域内",
+    )
+    parser.add_argument(
+        "--door-latency",
+        type=float,
+        default=0.0,
+        help="FakeGarageController 模拟的开门往返延迟 (秒)",
+    )
+    parser.add_argument("--json", dest="json_path", help="把结果写入 JSON 文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run_benchmark(args))
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"结果已写入 {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import os
+from dataclasses import dataclass
+
+import cv2
+import yaml
+
+# 配置文件中的旋转名称 -> cv2.rotate 参数 (None 表示不旋转)
+ROTATIONS = {
+    "none": None,
+    "90_cw": cv2.ROTATE_90_CLOCKWISE,
+    "90_ccw": cv2.ROTATE_90_COUNTERCLOCKWISE,
+    "180": cv2.ROTATE_180,
+}
+
+
+@dataclass
+class CameraConfig:
+    """一路摄像头的配置。未设置的间隔参数使用 main.py 中的全局默认值。"""
+
+    name: str
+    url: str
+    rotation: str = "90_cw"
+    idle_interval: float = None
+    burst_interval: float = None
+    burst_duration: float = None
+    # 可选的低分辨率子码流，空闲时用于运动检测，检测到运动或车辆后切回主码流
+    substream_url: str = None
+    # 感兴趣区域 (x, y, w, h)，源画面 (旋转前) 坐标；全部不大于 1 时按画面比例解释
+    roi: tuple = None
+
+    @property
+    def rotate_code(self):
+        return ROTATIONS[self.rotation]
+
+
+def parse_roi(value):
+    """
+    解析 ROI 配置: "x,y,w,h" 字符串或 4 个数字的列表，返回 (x, y, w, h) 或 None。
+    全部数值不大于 1 时表示占画面宽高的比例，否则为像素。
+    """
+    if value is None or value == "":
+        return None
+    parts = value.split(",") if isinstance(value, str) else list(value)
+    if len(parts) != 4:
+        raise ValueError(f"ROI 需要 4 个数 (x, y, w, h): {value}")
+    roi = tuple(float(part) for part in parts)
+    if roi[0] < 0 or roi[1] < 0 or roi[2] <= 0 or roi[3] <= 0:
+        raise ValueError(f"ROI 的位置不能为负数，宽高必须大于 0: {value}")
+    return roi
+
+
+def roi_to_pixels(roi, width: int, height: int):
+    """把 ROI 转换为源画面中的像素范围 (x1, y1, x2, y2)，并裁剪到画面内。"""
+    x, y, w, h = roi
+    if max(roi) <= 1:
+        x, y, w, h = x * width, y * height, w * width, h * height
+    x1 = min(max(int(round(x)), 0), width - 1)
+    y1 = min(max(int(round(y)), 0), height - 1)
+    x2 = min(max(int(round(x + w)), x1 + 1), width)
+    y2 = min(max(int(round(y + h)), y1 + 1), height)
+    return x1, y1, x2, y2
+
+
+def roi_to_fractions(roi, width: int, height: int):
+    """
+    把像素 ROI 换算成占 width x height 画面的比例 (已经是比例的 ROI 原样返回)。
+    像素 ROI 是按主码流分辨率配置的，换算成比例后在分辨率不同的子码流上也指向同一块区域。
+    """
+    if roi is None or max(roi) <= 1 or width <= 0 or height <= 0:
+        return roi
+    x1, y1, x2, y2 = roi_to_pixels(roi, width, height)
+    return (x1 / width, y1 / height, (x2 - x1) / width, (y2 - y1) / height)
+
+
+def _rotate_point(x, y, rotate_code, width, height):
+    """宽 width、高 height 的画面中的点在 cv2.rotate 之后的坐标。"""
+    if rotate_code == cv2.ROTATE_90_CLOCKWISE:
+        return height - y, x
+    if rotate_code == cv2.ROTATE_90_COUNTERCLOCKWISE:
+        return y, width - x
+    if rotate_code == cv2.ROTATE_180:
+        return width - x, height - y
+    return x, y
+
+
+def _unrotate_point(x, y, rotate_code, width, height):
+    """_rotate_point 的逆变换，width/height 为旋转前的宽高。"""
+    if rotate_code == cv2.ROTATE_90_CLOCKWISE:
+        return y, height - x
+    if rotate_code == cv2.ROTATE_90_COUNTERCLOCKWISE:
+        return width - y, x
+    if rotate_code == cv2.ROTATE_180:
+        return width - x, height - y
+    return x, y
+
+
+def map_box_to_frame(box, roi_pixels, rotate_code, width: int, height: int):
+    """
+    把在 (裁剪并旋转后的) ROI 画面上检测到的 [x1, y1, x2, y2] 映射回
+    整幅旋转后画面的坐标，与不使用 ROI 时的检测框坐标一致。
+    width/height 为源画面 (旋转前) 的宽高。
+    """
+    roi_x1, roi_y1, roi_x2, roi_y2 = roi_pixels or (0, 0, width, height)
+    roi_width, roi_height = roi_x2 - roi_x1, roi_y2 - roi_y1
+    corners = []
+    for x, y in ((box[0], box[1]), (box[2], box[3])):
+        u, v = _unrotate_point(x, y, rotate_code, roi_width, roi_height)
+        corners.append(_rotate_point(u + roi_x1, v + roi_y1, rotate_code, width, height))
+    (ax, ay), (bx, by) = corners
+    return [min(ax, bx), min(ay, by), max(ax, bx), max(ay, by)]
+
+
+def _parse_camera(entry: dict, index: int) -> CameraConfig:
+    if not isinstance(entry, dict) or not entry.get("url"):
+        raise ValueError(f"摄像头配置第 {index + 1} 项缺少 url")
+    rotation = str(entry.get("rotation", "90_cw"))
+    if rotation not in ROTATIONS:
+        raise ValueError(
+            f"摄像头配置第 {index + 1} 项的 rotation '{rotation}' 无效，"
+            f"可选值: {', '.join(ROTATIONS)}"
+        )
+
+    def optional_float(key):
+        return float(entry[key]) if entry.get(key) is not None else None
+
+    return CameraConfig(
+        name=str(entry.get("name") or f"camera{index + 1}"),
+        # 允许在 URL 中引用 .env 里的变量，例如 ${RTSP_URL_DRIVEWAY}，避免把密码写进配置文件
+        url=os.path.expandvars(str(entry["url"])),
+        rotation=rotation,
+        idle_interval=optional_float("idle_interval"),
+        burst_interval=optional_float("burst_interval"),
+        burst_duration=optional_float("burst_duration"),
+        substream_url=(
+            os.path.expandvars(str(entry["substream_url"]))
+            if entry.get("substream_url")
+            else None
+        ),
+        roi=parse_roi(entry.get("roi")),
+    )
+
+
+def load_camera_configs(
+    config_path: str = None,
+    fallback_url: str = None,
+    fallback_substream_url: str = None,
+    fallback_roi=None,
+):
+    """
+    读取多摄像头配置文件 (YAML)，格式:
+
+        cameras:
+          - name: driveway
+            url: ${RTSP_URL_DRIVEWAY}
+            rotation: 90_cw
+            idle_interval: 10
+            substream_url: ${RTSP_SUBSTREAM_URL_DRIVEWAY}
+            roi: [0.25, 0.4, 0.5, 0.6]
+
+    没有配置文件时，退回到单个 fallback_url (RTSP_URL) 摄像头，名称为空，
+    行为与单摄像头版本完全一致 (子码流为 fallback_substream_url，ROI 为 fallback_roi)。
+    """
+    if config_path:
+        with open(config_path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+        entries = data.get("cameras", []) if isinstance(data, dict) else data
+        cameras = [_parse_camera(entry, index) for index, entry in enumerate(entries)]
+        names = [camera.name for camera in cameras]
+        if len(set(names)) != len(names):
+            raise ValueError("摄像头配置中存在重复的 name")
+        return cameras
+
+    if fallback_url:
+        return [
+            CameraConfig(
+                name="",
+                url=fallback_url,
+                substream_url=fallback_substream_url or None,
+                roi=parse_roi(fallback_roi),
+            )
+        ]
+    return []
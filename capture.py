@@ -0,0 +1,308 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+import cv2
+
+import metrics
+
+
+# OpenCV 在打开流时读取这个环境变量，格式为 "key;value|key;value"
+FFMPEG_OPTIONS_ENV = "OPENCV_FFMPEG_CAPTURE_OPTIONS"
+_ffmpeg_options_lock = threading.Lock()
+
+
+def initialize_capture(rtsp_url: str, ffmpeg_options: str = None, timeout: float = None):
+    """
+    初始化并返回一个 VideoCapture 对象。
+    如果失败则返回 None。
+
+    ffmpeg_options 为 FFmpeg 打开参数，例如 "rtsp_transport;tcp|fflags;nobuffer"；
+    为 None 时使用进程环境中的 OPENCV_FFMPEG_CAPTURE_OPTIONS (如果有)。
+    timeout (秒) 同时作为打开和读帧的超时，读帧超时后 grab() 返回 False。
+    """
+    print(f"正在连接到 RTSP 流: {rtsp_url} ...")
+    params = []
+    if timeout:
+        timeout_ms = int(timeout * 1000)
+        params = [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC,
+            timeout_ms,
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC,
+            timeout_ms,
+        ]
+    if ffmpeg_options is None:
+        cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG, params)  # 尝试指定FFMPEG后端
+    else:
+        # 环境变量是进程全局的，多路摄像头同时连接时需要加锁
+        with _ffmpeg_options_lock:
+            previous = os.environ.get(FFMPEG_OPTIONS_ENV)
+            os.environ[FFMPEG_OPTIONS_ENV] = ffmpeg_options
+            try:
+                cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG, params)
+            finally:
+                if previous is None:
+                    os.environ.pop(FFMPEG_OPTIONS_ENV, None)
+                else:
+                    os.environ[FFMPEG_OPTIONS_ENV] = previous
+
+    if not cap.isOpened():
+        print(f"错误: 无法打开 RTSP 流位于 {rtsp_url}")
+        # 可以在这里添加更详细的错误检查提示
+        return None
+
+    print("成功连接到 RTSP 流。")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    print(
+        f"视频流属性: {width}x{height} @ {fps if fps > 0 else 'N/A'} FPS (摄像头报告值)"
+    )
+    return cap
+
+
+class FrameGrabber:
+    """
+    后台读帧线程。
+
+    持续调用 cap.grab() 清空 FFmpeg 缓冲区，只保留最新的一帧及其
+    time.monotonic() 采集时间戳，旧帧直接丢弃。事件循环通过 next_frame()
+    取帧，永远不会阻塞在网络 I/O 上。
+
+    retrieve_on_demand=True 时只有在有人等待新帧时才调用 cap.retrieve()
+    (颜色转换和拷贝)，两次 LPR 检查之间被丢弃的帧只 grab 不 retrieve。
+
+    FrameGrabber 拥有传入的 VideoCapture，读线程退出时负责 release()。
+    """
+
+    def __init__(self, cap, name: str = "frame-grabber", retrieve_on_demand: bool = True):
+        self._cap = cap
+        # 在读线程接管 cap 之前读取分辨率
+        self.frame_size = (
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+        self._last_grab_time = time.monotonic()
+        self.frames_grabbed = 0
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_time = 0.0
+        self._frame_seq = 0
+        self._failed = False
+        self._retrieve_on_demand = retrieve_on_demand
+        self._retrieve_requested = False
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            while not self._stop_event.is_set():
+                with metrics.observe_latency("capture"):
+                    ret = self._cap.grab()
+                if not ret:
+                    with self._cond:
+                        self._failed = True
+                        self._cond.notify_all()
+                    return
+                grabbed_at = time.monotonic()
+                self._last_grab_time = grabbed_at
+                self.frames_grabbed += 1
+                metrics.increment("frames_read")
+                if self._retrieve_on_demand and not self._retrieve_requested:
+                    continue
+
+                with metrics.observe_latency("capture_retrieve"):
+                    ret, frame = self._cap.retrieve()
+                if not ret:
+                    continue
+                metrics.increment("frames_retrieved")
+                with self._cond:
+                    self._frame = frame
+                    self._frame_time = grabbed_at
+                    self._frame_seq += 1
+                    self._retrieve_requested = False
+                    self._cond.notify_all()
+        finally:
+            self._cap.release()
+
+    @property
+    def failed(self) -> bool:
+        """读帧失败 (流断开) 或被看门狗判定为卡死后为 True。"""
+        return self._failed
+
+    @property
+    def last_grab_time(self) -> float:
+        """最近一次 grab 成功的 time.monotonic() 时间 (启动时为创建时间)。"""
+        return self._last_grab_time
+
+    def mark_failed(self):
+        """由看门狗调用: 流已卡死，唤醒所有等待新帧的调用方。"""
+        with self._cond:
+            self._failed = True
+            self._cond.notify_all()
+
+    def latest(self):
+        """返回 (frame, capture_monotonic, seq)，尚无帧时 frame 为 None。"""
+        with self._cond:
+            return self._frame, self._frame_time, self._frame_seq
+
+    def wait_for_frame(self, after_seq: int = 0, timeout: float = None):
+        """
+        阻塞等待序号大于 after_seq 的新帧，返回 (frame, capture_monotonic, seq)。
+        按需 retrieve 时总是等待调用之后抓取的一帧，不会返回槽位中的旧帧。
+        超时、失败或停止时返回当前槽位中的内容 (可能是旧帧或 None)。
+        """
+        with self._cond:
+            if self._retrieve_on_demand:
+                after_seq = max(after_seq, self._frame_seq)
+                self._retrieve_requested = True
+            self._cond.wait_for(
+                lambda: self._frame_seq > after_seq
+                or self._failed
+                or self._stop_event.is_set(),
+                timeout,
+            )
+            return self._frame, self._frame_time, self._frame_seq
+
+    async def next_frame(self, after_seq: int = 0, timeout: float = None):
+        """wait_for_frame() 的协程版本，在线程池中等待，不阻塞事件循环。"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self.wait_for_frame, after_seq, timeout
+        )
+
+    def stop(self, timeout: float = 2.0):
+        """
+        通知读线程退出并等待其结束。卡在 grab() 里的线程等不到时直接放弃，
+        它在 grab() 返回后自行退出并释放 cap。
+        """
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread.ident is None:
+            # 线程从未启动，由这里负责释放
+            self._cap.release()
+        elif self._thread.is_alive():
+            self._thread.join(timeout)
+
+
+class StreamSupervisor:
+    """
+    一路视频流的连接管理: 连接失败时按带抖动的指数退避无限重试，
+    看门狗在 stall_timeout 秒内没有抓到新帧时把流判定为卡死。
+
+    连续失败次数跨 open()/reconnect() 累计: 能连上但马上读帧失败或再次卡死的摄像头
+    同样按退避时间重连，不会被反复立即重连。新的流持续出帧 healthy_after 秒
+    (默认等于 stall_timeout) 后才清零。
+
+    打开 VideoCapture 和停止旧的读帧线程都在线程池中进行，
+    重连期间事件循环 (其他摄像头、Meross 保活) 照常运行。
+    """
+
+    def __init__(
+        self,
+        name: str = "main",
+        ffmpeg_options: str = None,
+        retrieve_on_demand: bool = True,
+        stall_timeout: float = 10.0,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 60.0,
+        healthy_after: float = None,
+    ):
+        self.name = name
+        self.ffmpeg_options = ffmpeg_options
+        self.retrieve_on_demand = retrieve_on_demand
+        self.stall_timeout = stall_timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.healthy_after = stall_timeout if healthy_after is None else healthy_after
+        self.grabber = None
+        self._watchdog_task = None
+        self._failures = 0
+        self._opened_at = 0.0
+
+    def backoff_delay(self, attempt: int) -> float:
+        """第 attempt 次 (从 0 开始) 失败后的等待时间: 指数增长，上限 backoff_max，带 50% 抖动。"""
+        delay = min(self.backoff_max, self.backoff_initial * (2**attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def open(self, url: str) -> FrameGrabber:
+        """
+        关闭当前的流并连接 url，直到成功为止，返回已启动的 FrameGrabber。
+        """
+        loop = asyncio.get_running_loop()
+        await self._stop_grabber()
+        while True:
+            cap = await loop.run_in_executor(
+                None, initialize_capture, url, self.ffmpeg_options, self.stall_timeout
+            )
+            if cap is not None:
+                break
+            delay = self.backoff_delay(self._failures)
+            self._failures += 1
+            print(f"[{self.name}] 连接失败 (连续第 {self._failures} 次)，{delay:.1f} 秒后重试。")
+            await asyncio.sleep(delay)
+
+        self.grabber = FrameGrabber(
+            cap,
+            name=f"frame-grabber-{self.name}",
+            retrieve_on_demand=self.retrieve_on_demand,
+        ).start()
+        self._opened_at = time.monotonic()
+        if self._watchdog_task is None:
+            self._watchdog_task = asyncio.create_task(
+                self._watchdog(), name=f"stream-watchdog-{self.name}"
+            )
+        return self.grabber
+
+    async def reconnect(self, url: str) -> FrameGrabber:
+        """流断开或卡死后重连: 先按连续失败次数退避，再调用 open()。"""
+        metrics.increment("reconnects")
+        await self._stop_grabber()
+        delay = self.backoff_delay(self._failures)
+        self._failures += 1
+        print(f"[{self.name}] 视频流中断 (连续第 {self._failures} 次)，{delay:.1f} 秒后重连。")
+        await asyncio.sleep(delay)
+        return await self.open(url)
+
+    def _is_healthy(self, grabber, now: float) -> bool:
+        return (
+            not grabber.failed
+            and grabber.frames_grabbed > 0
+            and now - self._opened_at >= self.healthy_after
+            and now - grabber.last_grab_time <= self.stall_timeout
+        )
+
+    async def _stop_grabber(self):
+        if self.grabber is not None:
+            grabber, self.grabber = self.grabber, None
+            await asyncio.get_running_loop().run_in_executor(None, grabber.stop)
+
+    async def _watchdog(self):
+        while True:
+            await asyncio.sleep(self.stall_timeout / 2)
+            grabber = self.grabber
+            if grabber is None or grabber.failed:
+                continue
+            now = time.monotonic()
+            stalled_for = now - grabber.last_grab_time
+            if stalled_for > self.stall_timeout:
+                print(f"[{self.name}] {stalled_for:.1f} 秒没有收到新帧，判定视频流卡死。")
+                metrics.increment("stream_stalls")
+                grabber.mark_failed()
+            elif self._failures and self._is_healthy(grabber, now):
+                # 持续出帧一段时间后才算恢复，之后的中断重新从最短退避开始
+                self._failures = 0
+
+    async def close(self):
+        if self._watchdog_task is not None:
+            self._watchdog_task.cancel()
+            await asyncio.gather(self._watchdog_task, return_exceptions=True)
+            self._watchdog_task = None
+        await self._stop_grabber()
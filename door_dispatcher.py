@@ -0,0 +1,86 @@
+import asyncio
+
+import metrics
+
+
+class DoorCommandDispatcher:
+    """
+    开门命令队列。
+
+    检测流水线调用 request_open() 后立即返回，不等待 Meross 云端往返；
+    专用的消费者任务依次执行 open_fn()。已经排队或正在执行的开门命令
+    会合并后续的请求 (同一次 burst 中的多个车牌或多帧)，只发送一次。
+    can_open_fn 在入队之前检查冷却时间，冷却中的请求不会入队。
+    """
+
+    # 冷却中 / 执行出错，与 open_garage_door() 的返回值一致
+    COOLDOWN_RESULT = 0
+    ERROR_RESULT = -1
+
+    def __init__(self, open_fn, can_open_fn=None):
+        self.open_fn = open_fn
+        self.can_open_fn = can_open_fn
+        self._queue = None
+        self._task = None
+        self._pending = None
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run(), name="door-dispatcher")
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pending is not None and not self._pending[0].done():
+            self._pending[0].cancel()
+        self._pending = None
+
+    def request_open(self, on_result=None):
+        """
+        请求开门，返回结果的 Future (open_fn 的返回值)。
+
+        on_result(result) 只对真正发出命令 (或因冷却被拒绝) 的请求调用一次，
+        被合并的请求共享同一个 Future 但不会再调用 on_result，
+        这样一次开门只记录一条日志。
+        """
+        loop = asyncio.get_running_loop()
+        if self._pending is not None and not self._pending[0].done():
+            metrics.increment("door_requests_coalesced")
+            return self._pending[0]
+
+        if self.can_open_fn is not None and not self.can_open_fn():
+            future = loop.create_future()
+            future.set_result(self.COOLDOWN_RESULT)
+            if on_result is not None:
+                on_result(self.COOLDOWN_RESULT)
+            return future
+
+        self.start()
+        future = loop.create_future()
+        self._pending = (future, on_result)
+        self._queue.put_nowait(self._pending)
+        return future
+
+    async def _run(self):
+        while True:
+            future, on_result = await self._queue.get()
+            if future.done():
+                continue
+            try:
+                result = await self.open_fn()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 调用方通常不会 await 这个 Future，用返回值而不是异常报告失败
+                print(f"开门命令执行失败: {e}")
+                result = self.ERROR_RESULT
+            future.set_result(result)
+            if on_result is not None:
+                try:
+                    on_result(result)
+                except Exception as e:
+                    print(f"处理开门结果时发生错误: {e}")
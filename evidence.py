@@ -0,0 +1,175 @@
+"""
+证据图片写入: 在线程池中编码并写盘，按总磁盘配额从最旧的文件开始删除。
+
+写入的文件记录在内存索引中 (按写入顺序)，启动时每个目录只扫描一次，
+之后清理只看索引，不需要再遍历目录。
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+import metrics
+
+EVIDENCE_FORMAT = os.getenv("EVIDENCE_FORMAT", "png").lower()  # png / jpg / webp
+EVIDENCE_QUALITY = int(os.getenv("EVIDENCE_QUALITY", "90"))  # jpg / webp, 0-100
+EVIDENCE_PNG_COMPRESSION = int(os.getenv("EVIDENCE_PNG_COMPRESSION", "3"))  # 0-9
+# 所有证据目录合计的磁盘配额，0 表示不限制
+EVIDENCE_MAX_MB = float(os.getenv("EVIDENCE_MAX_MB", "500"))
+EVIDENCE_WORKERS = int(os.getenv("EVIDENCE_WORKERS", "2"))
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def encode_params(image_format: str, quality: int, png_compression: int):
+    if image_format in ("jpg", "jpeg"):
+        return [cv2.IMWRITE_JPEG_QUALITY, quality]
+    if image_format == "webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    if image_format == "png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+    raise ValueError(f"不支持的证据图片格式: {image_format}")
+
+
+class EvidenceWriter:
+    """
+    异步证据写入器。submit() 立即返回 Future，编码和写盘在工作线程中完成。
+    提交后调用方不能再修改传入的图像数组。
+    """
+
+    def __init__(
+        self,
+        image_format=EVIDENCE_FORMAT,
+        quality=EVIDENCE_QUALITY,
+        png_compression=EVIDENCE_PNG_COMPRESSION,
+        max_total_bytes=int(EVIDENCE_MAX_MB * 1024 * 1024),
+        max_workers=EVIDENCE_WORKERS,
+    ):
+        self.image_format = image_format
+        self.quality = quality
+        self.png_compression = png_compression
+        # 提前校验格式，配置错误在启动时就报出来
+        encode_params(image_format, quality, png_compression)
+        self.max_total_bytes = max_total_bytes
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="evidence"
+        )
+        self._index = OrderedDict()  # path -> size，最旧的在前
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._directories = set()
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._total_bytes
+
+    def register_directory(self, directory: str):
+        """创建目录，并把已有的证据文件按修改时间加入索引 (每个目录只扫描一次)。"""
+        directory = os.path.abspath(directory)
+        with self._lock:
+            if directory in self._directories:
+                return
+            self._directories.add(directory)
+        os.makedirs(directory, exist_ok=True)
+        existing = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    stat = entry.stat()
+                    existing.append((stat.st_mtime, entry.path, stat.st_size))
+        existing.sort()
+        with self._lock:
+            for _, path, size in existing:
+                self._add_to_index(path, size)
+        self._evict()
+
+    def submit(self, directory: str, basename: str, image, image_format: str = None):
+        """
+        在后台保存 image 为 directory/basename.<格式扩展名>。
+        返回 Future，结果为写入的完整路径，失败时为 None。
+        """
+        image_format = image_format or self.image_format
+        path = self.path_for(directory, basename, image_format)
+        return self._executor.submit(self._write, path, image, image_format)
+
+    def path_for(self, directory: str, basename: str, image_format: str = None) -> str:
+        """submit() 会写入的完整路径。"""
+        return os.path.join(directory, f"{basename}.{image_format or self.image_format}")
+
+    def close(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def _write(self, path, image, image_format):
+        try:
+            with metrics.observe_latency("evidence_write"):
+                ok, encoded = cv2.imencode(
+                    f".{image_format}",
+                    image,
+                    encode_params(image_format, self.quality, self.png_compression),
+                )
+                if not ok:
+                    print(f"错误: 编码证据图片 {path} 失败。")
+                    return None
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # 先写临时文件再改名，读取方不会看到写了一半的图片
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(encoded.tobytes())
+                os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"保存证据图片 {path} 时发生异常: {e}")
+            return None
+
+        metrics.increment("evidence_written")
+        with self._lock:
+            self._add_to_index(os.path.abspath(path), int(encoded.size))
+        self._evict(keep=os.path.abspath(path))
+        return path
+
+    def _add_to_index(self, path, size):
+        old_size = self._index.pop(path, None)
+        if old_size is not None:
+            self._total_bytes -= old_size
+        self._index[path] = size
+        self._total_bytes += size
+
+    def _evict(self, keep: str = None):
+        if self.max_total_bytes <= 0:
+            return
+        while True:
+            with self._lock:
+                if self._total_bytes <= self.max_total_bytes or not self._index:
+                    return
+                path, size = next(iter(self._index.items()))
+                if path == keep:
+                    # 单个文件就超过配额时保留刚写入的文件
+                    return
+                del self._index[path]
+                self._total_bytes -= size
+            try:
+                os.remove(path)
+                metrics.increment("evidence_evicted")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"删除旧证据图片 {path} 时发生错误: {e}")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_evidence_writer() -> EvidenceWriter:
+    """全局证据写入器，首次调用时创建。"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = EvidenceWriter()
+    return _writer
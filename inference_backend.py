@@ -0,0 +1,217 @@
+"""
+YOLO 检测器的可选 CPU 推理后端。
+
+LPR_INFERENCE_BACKEND:
+    torch (默认)  直接用 .pt 权重通过 PyTorch 推理
+    onnx          导出为 ONNX 并用 ONNX Runtime 推理
+    openvino      导出为 OpenVINO IR 并用 OpenVINO 推理
+LPR_INFERENCE_INT8=1 时使用 INT8 量化模型 (ONNX 为动态量化，OpenVINO 为 NNCF 训练后量化)。
+
+导出的文件缓存在 .pt 旁边，.pt 更新后自动重新导出。ultralytics 对所有后端返回
+相同格式的 Results，因此 main.py 中的检测代码不需要任何修改。
+
+对比 torch 与其他后端的延迟和检测结果差异:
+    python inference_backend.py license_plate_detector.pt samples/ --backend onnx --int8
+"""
+
+import argparse
+import os
+import time
+
+BACKENDS = ("torch", "onnx", "openvino")
+EXPORT_IMGSZ = int(os.getenv("LPR_EXPORT_IMGSZ", "640"))
+INT8_CALIBRATION_DATA = os.getenv("LPR_INT8_DATA")
+
+
+def _is_fresh(artifact_path: str, source_path: str) -> bool:
+    return os.path.exists(artifact_path) and os.path.getmtime(
+        artifact_path
+    ) >= os.path.getmtime(source_path)
+
+
+def exported_model_path(pt_path: str, backend: str, int8: bool = False) -> str:
+    """导出产物的缓存路径 (与 ultralytics 的命名保持一致)。"""
+    stem = os.path.splitext(pt_path)[0]
+    if backend == "onnx":
+        return f"{stem}_int8.onnx" if int8 else f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_int8_openvino_model" if int8 else f"{stem}_openvino_model"
+    return pt_path
+
+
+def export_model(pt_path: str, backend: str, int8: bool = False) -> str:
+    """导出 (或复用已缓存的) 后端模型，返回可以直接传给 YOLO() 的路径。"""
+    from ultralytics import YOLO  # pylint: disable=no-name-in-module
+
+    target = exported_model_path(pt_path, backend, int8)
+    if backend == "torch" or _is_fresh(target, pt_path):
+        return target
+
+    print(f"正在导出 {pt_path} -> {target} (backend={backend}, int8={int8}) ...")
+    started = time.perf_counter()
+    if backend == "onnx":
+        fp32_path = exported_model_path(pt_path, "onnx", int8=False)
+        if not _is_fresh(fp32_path, pt_path):
+            fp32_path = YOLO(pt_path).export(
+                format="onnx", imgsz=EXPORT_IMGSZ, dynamic=True, simplify=True
+            )
+        if int8:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantize_dynamic(fp32_path, target, weight_type=QuantType.QUInt8)
+        else:
+            target = fp32_path
+    elif backend == "openvino":
+        export_args = {"format": "openvino", "imgsz": EXPORT_IMGSZ, "dynamic": True}
+        if int8:
+            # NNCF 训练后量化的校准数据集 (ultralytics 数据集 yaml)，未设置时使用 ultralytics 默认值
+            export_args["int8"] = True
+            if INT8_CALIBRATION_DATA:
+                export_args["data"] = INT8_CALIBRATION_DATA
+        target = YOLO(pt_path).export(**export_args).rstrip(os.sep)
+    else:
+        raise ValueError(f"未知的推理后端: {backend}")
+    print(f"导出完成，用时 {time.perf_counter() - started:.1f} 秒。")
+    return target
+
+
+def _resolve_backend(backend: str = None, int8: bool = None):
+    backend = backend or os.getenv("LPR_INFERENCE_BACKEND", "torch")
+    if int8 is None:
+        int8 = os.getenv("LPR_INFERENCE_INT8", "0") == "1"
+    if backend not in BACKENDS:
+        print(f"错误: 未知的推理后端 '{backend}'，使用 torch。")
+        backend = "torch"
+    return backend, int8
+
+
+def prepare_yolo_model(pt_path: str, backend: str = None, int8: bool = None):
+    """
+    只导出不加载: 在启动推理工作进程之前由父进程调用一次，
+    工作进程随后只加载已经导出好的文件，不会同时导出同一个目标。
+    """
+    backend, int8 = _resolve_backend(backend, int8)
+    if backend == "torch":
+        return
+    try:
+        export_model(pt_path, backend, int8)
+    except Exception as e:
+        print(f"错误: 无法导出 {pt_path} ({backend}): {e}")
+
+
+def load_yolo_model(pt_path: str, backend: str = None, int8: bool = None, allow_export=True):
+    """
+    按 LPR_INFERENCE_BACKEND / LPR_INFERENCE_INT8 加载 YOLO 检测器。
+    导出或加载失败时退回 PyTorch，保证程序仍然可以运行。
+    allow_export=False 时只使用已导出的文件 (推理工作进程中)，没有最新的导出文件时直接退回 PyTorch。
+    """
+    from ultralytics import YOLO  # pylint: disable=no-name-in-module
+
+    backend, int8 = _resolve_backend(backend, int8)
+    if backend == "torch":
+        return YOLO(pt_path)
+
+    try:
+        if allow_export:
+            model_path = export_model(pt_path, backend, int8)
+        else:
+            model_path = exported_model_path(pt_path, backend, int8)
+            if not _is_fresh(model_path, pt_path):
+                raise FileNotFoundError(f"没有最新的导出文件 {model_path}")
+        return YOLO(model_path, task="detect")
+    except Exception as e:
+        print(f"错误: 无法使用 {backend} 后端加载 {pt_path}: {e}，退回 torch。")
+        return YOLO(pt_path)
+
+
+def _match_boxes(reference, candidate, iou_threshold=0.5):
+    """按同类别、IoU 贪心匹配两组 [x1, y1, x2, y2, score, class_id]，返回匹配对的 IoU 列表。"""
+    from util import box_iou
+
+    ious = []
+    used = set()
+    for ref in sorted(reference, key=lambda box: -box[4]):
+        best_index, best_iou = None, iou_threshold
+        for index, cand in enumerate(candidate):
+            if index in used or int(cand[5]) != int(ref[5]):
+                continue
+            iou = box_iou(ref[:4], cand[:4])
+            if iou >= best_iou:
+                best_index, best_iou = index, iou
+        if best_index is not None:
+            used.add(best_index)
+            ious.append(best_iou)
+    return ious
+
+
+def compare_backends(pt_path: str, samples_dir: str, backend: str, int8: bool = False):
+    """
+    在样本图像上对比 torch 与指定后端: 平均/p95 延迟，以及以 torch 结果为基准的
+    召回率、精确率和匹配框的平均 IoU。
+    """
+    import cv2
+    from benchmark import IMAGE_EXTENSIONS, percentile
+
+    paths = sorted(
+        os.path.join(samples_dir, name)
+        for name in os.listdir(samples_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    images = [image for image in (cv2.imread(path) for path in paths) if image is not None]
+    if not images:
+        raise SystemExit(f"错误: {samples_dir} 中没有样本图像")
+
+    models = {
+        "torch": load_yolo_model(pt_path, "torch"),
+        backend: load_yolo_model(pt_path, backend, int8),
+    }
+    latencies = {name: [] for name in models}
+    boxes = {name: [] for name in models}
+    for name, model in models.items():
+        model(images[0], verbose=False)  # 预热
+        for image in images:
+            started = time.perf_counter()
+            result = model(image, verbose=False)[0]
+            latencies[name].append(time.perf_counter() - started)
+            boxes[name].append(result.boxes.data.tolist())
+
+    reference_total = sum(len(frame_boxes) for frame_boxes in boxes["torch"])
+    candidate_total = sum(len(frame_boxes) for frame_boxes in boxes[backend])
+    ious = []
+    for reference, candidate in zip(boxes["torch"], boxes[backend]):
+        ious.extend(_match_boxes(reference, candidate))
+
+    label = f"{backend}{' int8' if int8 else ''}"
+    print(f"样本数: {len(images)}")
+    for name in models:
+        shown = label if name == backend else name
+        print(
+            f"  {shown:<14} 平均 {sum(latencies[name]) / len(images) * 1000:8.1f} ms"
+            f"  p95 {percentile(latencies[name], 95) * 1000:8.1f} ms"
+        )
+    recall = len(ious) / reference_total if reference_total else 1.0
+    precision = len(ious) / candidate_total if candidate_total else 1.0
+    mean_iou = sum(ious) / len(ious) if ious else 0.0
+    print(
+        f"  相对 torch: 召回率 {recall:.3f}  精确率 {precision:.3f}  匹配框平均 IoU {mean_iou:.3f}"
+    )
+    return {
+        "latency": latencies,
+        "recall": recall,
+        "precision": precision,
+        "mean_iou": mean_iou,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="对比 torch 与 ONNX/OpenVINO 推理后端")
+    parser.add_argument("model", help=".pt 权重文件，例如 license_plate_detector.pt")
+    parser.add_argument("samples", help="样本图像目录")
+    parser.add_argument("--backend", default="onnx", choices=["onnx", "openvino"])
+    parser.add_argument("--int8", action="store_true", help="使用 INT8 量化模型")
+    args = parser.parse_args(argv)
+    compare_backends(args.model, args.samples, args.backend, args.int8)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BatchedInferenceService:
+    """
+    多路摄像头共享的批量推理服务。
+
+    各路流通过 infer()/infer_many() 提交图像并 await 结果；服务在
+    max_wait 秒内 (或凑满 max_batch_size 张) 收集来自所有流的图像，
+    合并成一次 batch_fn 调用，在专用线程中运行，再把结果分发回各自的调用方。
+    batch_fn 接收图像列表 (以及 infer() 传入的关键字参数，例如 imgsz)，返回等长的结果列表；
+    关键字参数不同的请求不会合并到同一次调用中。
+
+    concurrency 为同时执行的批次数。默认 1: 同一个模型永远不会被并发调用；
+    batch_fn 把批次转发给推理工作进程池时 (见 inference_workers.py)，
+    设为工作进程数，让多个批次在不同的进程中同时推理。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn,
+        max_batch_size: int = 8,
+        max_wait=0.02,
+        concurrency: int = 1,
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.concurrency = max(1, concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix=f"infer-{name}"
+        )
+        self._queue = None
+        self._task = None
+        self._running = set()
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(
+                self._run(), name=f"infer-{self.name}"
+            )
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for task in list(self._running):
+            task.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+        # 取消尚未处理的请求
+        while self._queue is not None and not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+
+    async def infer(self, image, **options):
+        """提交一张图像，返回 batch_fn(images, **options) 对它的结果。options 的值必须可哈希。"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((image, tuple(sorted(options.items())), future))
+        return await future
+
+    async def infer_many(self, images, **options):
+        """提交多张图像 (例如同一帧的多个车辆裁剪图)，它们会进入同一批或相邻批次。"""
+        return list(
+            await asyncio.gather(*(self.infer(image, **options) for image in images))
+        )
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            await slots.acquire()
+            try:
+                batch = await self._next_batch()
+            except BaseException:
+                slots.release()
+                raise
+            # 调用方可能已经取消；按推理参数分组，每组一次 batch_fn 调用
+            groups = {}
+            for image, options, future in batch:
+                if not future.done():
+                    groups.setdefault(options, []).append((image, future))
+            if not groups:
+                slots.release()
+                continue
+            task = asyncio.create_task(self._run_groups(groups))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _run_groups(self, groups):
+        loop = asyncio.get_running_loop()
+        for options, batch in groups.items():
+            images = [image for image, _ in batch]
+            try:
+                results = await loop.run_in_executor(
+                    self._executor,
+                    functools.partial(self.batch_fn, images, **dict(options)),
+                )
+            except asyncio.CancelledError:
+                for group in groups.values():
+                    for _, future in group:
+                        future.cancel()
+                raise
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
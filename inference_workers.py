@@ -0,0 +1,187 @@
+"""
+多进程推理工作池。
+
+检测和 OCR 在独立的工作进程中运行，充分利用多核 CPU。帧不经过 pickle:
+父进程把图像写入 multiprocessing.shared_memory 中的环形槽位，只把
+(槽位偏移, 形状, dtype) 发给工作进程，工作进程直接在共享内存上构造
+NumPy 视图；返回的只有检测框列表和车牌字符串。
+
+每个工作进程启动时调用一次 loader (main.load_models)，模型在进程内
+只加载一次。工作进程用 spawn 方式启动，不继承父进程的线程和模型。
+"""
+
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+import metrics
+
+
+class SharedFrameRing:
+    """
+    一块共享内存切分成 slots 个固定大小的槽位。
+
+    acquire() 取一个空闲槽位 (没有空闲槽位时返回 None，由调用方改用 pickle 传递)，
+    write() 把图像拷贝进槽位并返回工作进程可用的引用，用完后 release()。
+    槽位的分配只在父进程中进行，可以被多个线程同时调用。
+    """
+
+    def __init__(self, slots: int, slot_bytes: int):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, slots * slot_bytes))
+        self._free = queue.SimpleQueue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def acquire(self):
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            return None
+
+    def release(self, slot: int):
+        self._free.put(slot)
+
+    def write(self, slot: int, image):
+        """把 image 拷贝到槽位 (只拷贝一次，非连续的视图也可以)，返回 (偏移, 形状, dtype)。"""
+        offset = slot * self.slot_bytes
+        view = np.ndarray(image.shape, image.dtype, buffer=self.shm.buf, offset=offset)
+        np.copyto(view, image)
+        return offset, image.shape, image.dtype.str
+
+    def close(self):
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# 工作进程中的状态
+_worker_shm = None
+
+
+def _attach_shared_memory(name: str):
+    if sys.version_info >= (3, 13):
+        # 共享内存由父进程负责回收，工作进程不登记到 resource tracker
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def _init_worker(shm_name: str, loader, threads: int):
+    global _worker_shm
+    # 多个工作进程共享 CPU，每个进程只用分到的线程数，避免过度订阅
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_shm = _attach_shared_memory(shm_name)
+    if loader is not None:
+        loader()
+
+
+def _worker_ready(hold: float):
+    # 占住当前进程一小段时间，让其余的任务交给其他 (可能还在加载模型的) 工作进程
+    time.sleep(hold)
+    return os.getpid()
+
+
+def _run_in_worker(fn, refs, options):
+    images = []
+    for ref in refs:
+        if isinstance(ref, np.ndarray):
+            images.append(ref)
+        else:
+            offset, shape, dtype = ref
+            images.append(
+                np.ndarray(shape, np.dtype(dtype), buffer=_worker_shm.buf, offset=offset)
+            )
+    return fn(images, **options)
+
+
+class InferenceWorkerPool:
+    """
+    推理工作进程池。run(fn, images, **options) 在某个工作进程中执行 fn(images, **options)
+    并返回结果，调用方线程阻塞等待；多个线程可以同时调用，请求分散到不同的工作进程。
+
+    fn 必须是模块级函数 (按名字 pickle)，返回值应当只包含检测框、字符串等小对象。
+    """
+
+    def __init__(self, workers: int, loader=None, slots: int = 16, slot_bytes: int = 8 << 20):
+        self.workers = workers
+        self.loader = loader
+        self.ring = SharedFrameRing(slots, slot_bytes)
+        self.threads = max(1, (os.cpu_count() or 1) // workers)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._create_executor()
+
+    def _create_executor(self):
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.ring.name, self.loader, self.threads),
+        )
+
+    def start(self):
+        """启动全部工作进程并等待模型加载完成 (阻塞，在线程池中调用)。"""
+        pids = set()
+        while len(pids) < self.workers:
+            futures = [
+                self._executor.submit(_worker_ready, 0.05) for _ in range(self.workers)
+            ]
+            pids.update(future.result() for future in futures)
+        print(f"推理工作进程已就绪: {len(pids)} 个进程，每个进程 {self.threads} 个线程。")
+        return self
+
+    def run(self, fn, images, **options):
+        slots = []
+        refs = []
+        try:
+            for image in images:
+                image = np.asarray(image)
+                slot = self.ring.acquire() if image.nbytes <= self.ring.slot_bytes else None
+                if slot is None:
+                    # 槽位用完或图像超过槽位大小时退回到 pickle 传递
+                    metrics.increment("worker_pickled_images")
+                    refs.append(image)
+                    continue
+                slots.append(slot)
+                refs.append(self.ring.write(slot, image))
+            executor = self._executor
+            try:
+                return executor.submit(_run_in_worker, fn, refs, options).result()
+            except BrokenProcessPool:
+                # 工作进程崩溃 (例如被 OOM 杀掉): 重建进程池，本批次报错，后续请求继续处理
+                with self._executor_lock:
+                    if self._executor is executor:
+                        print("错误: 推理工作进程异常退出，正在重建进程池。")
+                        metrics.increment("worker_restarts")
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        self._create_executor()
+                raise
+        finally:
+            for slot in slots:
+                self.ring.release(slot)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self.ring.close()
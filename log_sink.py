@@ -0,0 +1,229 @@
+"""
+后台日志写入: 所有 log.csv / log.txt 写入都先进入队列，由单独的线程批量写盘。
+
+检测路径上只做一次 put_nowait，不会因为 SD 卡上的小文件同步写入而卡顿。
+写入线程保持文件句柄打开，每 LOG_FLUSH_INTERVAL 秒或积累 LOG_FLUSH_LINES 行时
+写入并 flush 一次，并按大小 (LOG_ROTATE=size) 或日期 (LOG_ROTATE=daily) 轮转，
+只保留最新的 LOG_BACKUP_COUNT 个历史文件。
+"""
+
+import atexit
+import csv
+import glob
+import io
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import metrics
+
+LOG_ROTATE = os.getenv("LOG_ROTATE", "size")  # size / daily / none
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))  # seconds
+LOG_FLUSH_LINES = int(os.getenv("LOG_FLUSH_LINES", "100"))
+LOG_QUEUE_SIZE = 10000
+
+
+class _LogFile:
+    """写入线程独占的一个日志文件: 打开的句柄、当前大小和轮转状态。"""
+
+    def __init__(self, path, header, rotate, max_bytes, backup_count):
+        self.path = path
+        self.header = header
+        self.rotate = rotate
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._file = None
+        self._size = 0
+        self._day = None
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a", newline="", encoding="utf-8")
+        self._size = self._file.tell()
+        self._day = datetime.fromtimestamp(
+            os.path.getmtime(self.path) if self._size else time.time()
+        ).date()
+        if self._size == 0 and self.header:
+            self._file.write(self.header)
+            self._size += len(self.header.encode("utf-8"))
+            print(f"日志文件 '{self.path}' 已创建并写入表头。")
+
+    def _rotate_if_needed(self, incoming_bytes):
+        if self.rotate == "daily":
+            today = datetime.now().date()
+            if today == self._day:
+                return
+            suffix = self._day.isoformat()
+        elif self.rotate == "size":
+            if self._size == 0 or self._size + incoming_bytes <= self.max_bytes:
+                return
+            suffix = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        else:
+            return
+
+        self._file.close()
+        self._file = None
+        rotated = f"{self.path}.{suffix}"
+        if os.path.exists(rotated):
+            rotated = f"{rotated}_{int(time.time() * 1000) % 1000:03d}"
+        os.replace(self.path, rotated)
+        # 历史文件名按时间排序，删除最旧的
+        history = sorted(glob.glob(f"{glob.escape(self.path)}.*"))
+        for old_path in history[: max(0, len(history) - self.backup_count)]:
+            try:
+                os.remove(old_path)
+            except OSError as e:
+                print(f"删除旧日志 '{old_path}' 时发生错误: {e}")
+        self._open()
+
+    def write(self, text):
+        if self._file is None:
+            self._open()
+        data_bytes = len(text.encode("utf-8"))
+        self._rotate_if_needed(data_bytes)
+        self._file.write(text)
+        self._size += data_bytes
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class LogSink:
+    """
+    单线程后台日志写入器。write_row()/write_line() 可以在任何线程调用且从不阻塞;
+    队列满时丢弃该行并计数 (log_lines_dropped)。
+    """
+
+    def __init__(
+        self,
+        rotate=LOG_ROTATE,
+        max_bytes=LOG_MAX_BYTES,
+        backup_count=LOG_BACKUP_COUNT,
+        flush_interval=LOG_FLUSH_INTERVAL,
+        flush_lines=LOG_FLUSH_LINES,
+        queue_size=LOG_QUEUE_SIZE,
+    ):
+        self.rotate = rotate
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.flush_lines = flush_lines
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._files = {}
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+
+    def write_line(self, path, text, header=None):
+        line = str(text)
+        if not line.endswith("\n"):
+            line += "\n"
+        try:
+            self._queue.put_nowait((path, line, header))
+        except queue.Full:
+            metrics.increment("log_lines_dropped")
+
+    def write_row(self, path, row, header=None):
+        """写入一行 CSV；header 只在文件新建或为空时写入一次。"""
+        self.write_line(path, _format_csv_row(row), _format_csv_row(header) if header else None)
+
+    def flush(self, timeout=5.0):
+        """等待此前提交的所有行写入磁盘。"""
+        done = threading.Event()
+        try:
+            self._queue.put((None, done, None), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        if self._thread.is_alive():
+            try:
+                self._queue.put((None, None, None), timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+
+    def _file_for(self, path, header):
+        log_file = self._files.get(path)
+        if log_file is None:
+            log_file = _LogFile(path, header, self.rotate, self.max_bytes, self.backup_count)
+            self._files[path] = log_file
+        return log_file
+
+    def _write_batch(self, batch):
+        touched = set()
+        for path, text, header in batch:
+            try:
+                log_file = self._file_for(path, header)
+                log_file.write(text)
+                touched.add(log_file)
+            except Exception as e:
+                print(f"写入日志到 '{path}' 时发生错误: {e}")
+        for log_file in touched:
+            try:
+                log_file.flush()
+            except Exception as e:
+                print(f"写入日志到 '{log_file.path}' 时发生错误: {e}")
+
+    def _run(self):
+        batch = []
+        deadline = None
+        running = True
+        while running:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                path, text, header = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                path = text = None
+                header = None
+            else:
+                if path is not None:
+                    batch.append((path, text, header))
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    if len(batch) < self.flush_lines:
+                        continue
+                elif text is None:
+                    running = False
+            # 到达刷新时间、积累足够多的行、收到 flush 请求或关闭
+            if batch:
+                self._write_batch(batch)
+                batch = []
+            deadline = None
+            if isinstance(text, threading.Event):
+                text.set()
+        for log_file in self._files.values():
+            log_file.close()
+
+
+def _format_csv_row(row):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue()
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_log_sink() -> LogSink:
+    """全局日志写入器，首次调用时启动写入线程，进程退出时写完剩余的行。"""
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = LogSink()
+                atexit.register(_sink.close)
+    return _sink
@@ -1,36 +1,264 @@
 import asyncio
-from ultralytics import YOLO  # pylint: disable=no-name-in-module
 import cv2
+import functools
+import multiprocessing
 import os
 from dotenv import load_dotenv
+import threading
 import time
 import numpy as np
 
 from util import (
-    read_license_plate,
+    get_recognizer,
+    read_license_plates,
     write_log_entry,
-    is_string_similar_to_any_in_list,
+    write_log_to_txt,
+    box_iou,
+    PlateWhitelistIndex,
+    VectorizedPlateMatcher,
 )
 
 from meross_controller import MerossGarageController
+from capture import StreamSupervisor
+from pipeline import LprJob, LprPipeline, PipelineStage
+from scheduling import InferenceResolutionScheduler, LprScheduler, MotionGate, rect_imgsz
+from tracker import VehicleTracker
+from ocr_cache import PlateOcrCache, dhash
+from whitelist import WhitelistWatcher
+from door_dispatcher import DoorCommandDispatcher
+from cameras import load_camera_configs, map_box_to_frame, roi_to_fractions, roi_to_pixels
+from inference_service import BatchedInferenceService
+from inference_workers import InferenceWorkerPool
+from inference_backend import load_yolo_model, prepare_yolo_model
+from log_sink import get_log_sink
+from evidence import get_evidence_writer
+import metrics
+
+# 启动时间 (模块导入完成时)，用于启动耗时报告；模型在之后才加载，导入本身很快
+_PROCESS_START = time.perf_counter()
 
 load_dotenv()
 
 rtsp_url = os.getenv("RTSP_URL")
+# 可选的低分辨率子码流: 空闲时只解码子码流做运动检测，检测到运动或车辆后切回主码流
+rtsp_substream_url = os.getenv("RTSP_SUBSTREAM_URL")
+# FFmpeg 打开参数: TCP 传输、不缓冲、低延迟解码；设为空字符串则使用 OpenCV 默认值
+LPR_FFMPEG_OPTIONS = os.getenv(
+    "LPR_FFMPEG_OPTIONS", "rtsp_transport;tcp|fflags;nobuffer|flags;low_delay"
+)
+# 单摄像头的感兴趣区域 "x,y,w,h" (源画面坐标，旋转前)；全部不大于 1 时按比例解释
+LPR_ROI = os.getenv("LPR_ROI")
+# 只对真正要处理的帧做 retrieve (颜色转换和拷贝)，其余帧只 grab
+LPR_RETRIEVE_ON_DEMAND = os.getenv("LPR_RETRIEVE_ON_DEMAND", "1") == "1"
+# 多摄像头模式: 指向 YAML 配置文件 (见 cameras.py)，未设置时只使用 RTSP_URL
+cameras_file = os.getenv("LPR_CAMERAS_FILE")
+
+# 多路摄像头共享推理服务: 在 LPR_BATCH_MAX_WAIT 秒内收集的帧合并为一次 YOLO 调用
+LPR_BATCH_MAX_SIZE = int(os.getenv("LPR_BATCH_MAX_SIZE", "8"))
+LPR_BATCH_MAX_WAIT = float(os.getenv("LPR_BATCH_MAX_WAIT", "0.02"))  # seconds
+
+# 多进程推理: 检测和 OCR 在 LPR_INFERENCE_WORKERS 个工作进程中运行，0 表示在本进程的线程中运行
+LPR_INFERENCE_WORKERS = int(os.getenv("LPR_INFERENCE_WORKERS", "0"))
+# 传帧用的共享内存槽位数与每个槽位的大小，放不下的图像退回到 pickle 传递
+LPR_WORKER_SLOTS = int(os.getenv("LPR_WORKER_SLOTS", "16"))
+LPR_WORKER_SLOT_MB = float(os.getenv("LPR_WORKER_SLOT_MB", "8"))
+
+# 级联模式: 只在 COCO 检测到的车辆区域内运行车牌检测器，没有车辆时完全跳过
+LPR_CASCADE = os.getenv("LPR_CASCADE", "1") == "1"
+VEHICLE_CROP_MARGIN = 0.05  # 车辆框向外扩展的比例
+
+# YOLO 输入尺寸: 没有车或车辆较远时用 LPR_VEHICLE_IMGSZ 判断有无车辆，
+# 上一次检测到的车辆框面积占画面比例达到 LPR_NEAR_VEHICLE_AREA 时改用 LPR_VEHICLE_IMGSZ_NEAR
+LPR_DYNAMIC_IMGSZ = os.getenv("LPR_DYNAMIC_IMGSZ", "1") == "1"
+LPR_VEHICLE_IMGSZ = int(os.getenv("LPR_VEHICLE_IMGSZ", "320"))
+LPR_VEHICLE_IMGSZ_NEAR = int(os.getenv("LPR_VEHICLE_IMGSZ_NEAR", "640"))
+LPR_NEAR_VEHICLE_AREA = float(os.getenv("LPR_NEAR_VEHICLE_AREA", "0.03"))
+LPR_PLATE_IMGSZ = int(os.getenv("LPR_PLATE_IMGSZ", "640"))
+# 矩形推理: 按画面长宽比缩放，不把竖屏画面填充成正方形
+LPR_VEHICLE_RECT = os.getenv("LPR_VEHICLE_RECT", "1") == "1"
+LPR_PLATE_RECT = os.getenv("LPR_PLATE_RECT", "1") == "1"
+
+# 车辆跟踪: 同一辆车的多次识别结果加权投票，确认车牌后不再 OCR
+LPR_TRACK_MAX_AGE = float(os.getenv("LPR_TRACK_MAX_AGE", "30"))  # seconds
+LPR_TRACK_CONFIRM_READS = int(os.getenv("LPR_TRACK_CONFIRM_READS", "2"))
+
+# OCR 结果缓存: 感知哈希相近且位置相同的车牌裁剪图在 TTL 内复用上次的识别结果
+LPR_OCR_CACHE = os.getenv("LPR_OCR_CACHE", "1") == "1"
+LPR_OCR_CACHE_TTL = float(os.getenv("LPR_OCR_CACHE_TTL", "5"))  # seconds
+LPR_OCR_CACHE_MAX_HAMMING = int(os.getenv("LPR_OCR_CACHE_MAX_HAMMING", "4"))
+
+# 自适应 LPR 调度 (见 scheduling.py)
+# idle 模式下的兜底处理间隔，即使没有检测到运动也会每隔这么久处理一帧
+LPR_PROCESSING_INTERVAL = float(os.getenv("LPR_PROCESSING_INTERVAL", "10"))  # seconds
+# 检测到车辆后的 burst 模式：处理间隔与最后一次看到车辆后的持续时间
+LPR_BURST_INTERVAL = float(os.getenv("LPR_BURST_INTERVAL", "1.0"))  # seconds
+LPR_BURST_DURATION = float(os.getenv("LPR_BURST_DURATION", "8"))  # seconds
+# 运动门控：检查频率、缩小后的宽度、像素差阈值和变化面积占比阈值
+MOTION_CHECK_INTERVAL = float(os.getenv("MOTION_CHECK_INTERVAL", "0.5"))  # seconds
+MOTION_DOWNSCALE_WIDTH = int(os.getenv("MOTION_DOWNSCALE_WIDTH", "160"))
+MOTION_PIXEL_THRESHOLD = int(os.getenv("MOTION_PIXEL_THRESHOLD", "25"))
+MOTION_MIN_AREA_RATIO = float(os.getenv("MOTION_MIN_AREA_RATIO", "0.005"))
+FRAME_WAIT_TIMEOUT = 10  # seconds, 等待读帧线程产出新帧的最长时间
+# 视频流看门狗: 超过这个时间没有抓到新帧就判定卡死并重连 (同时用作打开/读帧超时)
+STREAM_STALL_TIMEOUT = float(os.getenv("STREAM_STALL_TIMEOUT", "10"))  # seconds
+# 重连退避: 从 RECONNECT_BACKOFF_INITIAL 秒开始翻倍，最长 RECONNECT_BACKOFF_MAX 秒，无限重试
+RECONNECT_BACKOFF_INITIAL = float(os.getenv("RECONNECT_BACKOFF_INITIAL", "1"))  # seconds
+RECONNECT_BACKOFF_MAX = float(os.getenv("RECONNECT_BACKOFF_MAX", "60"))  # seconds
+# 启动时用与视频流相同分辨率的空白帧预热模型
+LPR_WARMUP = os.getenv("LPR_WARMUP", "1") == "1"
+# Meross 会话保活: 后台刷新会话与设备在线状态的间隔
+MEROSS_KEEPALIVE_INTERVAL = float(os.getenv("MEROSS_KEEPALIVE_INTERVAL", "60"))  # seconds
+# Meross 云端 API 地址 (可指向本地替身服务) 与会话/设备缓存文件，缓存文件设为空则不缓存
+MEROSS_API_BASE_URL = os.getenv("MEROSS_API_BASE_URL", "https://iotx-us.meross.com")
+MEROSS_SESSION_CACHE = os.getenv("MEROSS_SESSION_CACHE", ".meross_session.json")
+# 本地 Prometheus 指标端点 (http://127.0.0.1:METRICS_PORT/metrics)，设为 0 关闭
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+
+# load models lazily: 只导入本模块 (例如使用工具函数) 时不加载 torch 和 YOLO 权重
+COCO_MODEL_PATH = "yolov8n.pt"
+LICENSE_PLATE_MODEL_PATH = "license_plate_detector.pt"
+_models = {}
+_models_lock = threading.Lock()
+
+
+def _get_model(path: str):
+    model = _models.get(path)
+    if model is None:
+        with _models_lock:
+            model = _models.get(path)
+            if model is None:
+                # LPR_INFERENCE_BACKEND / LPR_INFERENCE_INT8 选择 torch、ONNX 或 OpenVINO；
+                # 推理工作进程只加载父进程导出好的文件，不自己导出
+                model = load_yolo_model(
+                    path, allow_export=multiprocessing.parent_process() is None
+                )
+                _models[path] = model
+    return model
+
 
-LPR_PROCESSING_INTERVAL = 10  # seconds
+def get_coco_model():
+    """车辆检测用的 COCO YOLO 模型，首次调用时加载。"""
+    return _get_model(COCO_MODEL_PATH)
 
 
-# load models
-coco_model = YOLO("yolov8n.pt")
-license_plate_detector = YOLO("license_plate_detector.pt")
+def get_license_plate_detector():
+    """车牌检测 YOLO 模型，首次调用时加载。"""
+    return _get_model(LICENSE_PLATE_MODEL_PATH)
+
 
 # car, truck, bus, motorcycle
 vehicles = [2, 3, 5, 7]
 license_plate_whitelist = []
+WHITELIST_CONFIDENCE_PERCENT = 80
+
+
+def build_plate_matcher(plates):
+    """
+    预先构建白名单匹配器，匹配时不再逐条计算编辑距离。
+    LPR_MATCHER=index (默认): 适合大白名单的分片索引；
+    LPR_MATCHER=matrix: NumPy 向量化引擎，一次为整批候选文字打分。
+    """
+    if os.getenv("LPR_MATCHER", "index") == "matrix":
+        return VectorizedPlateMatcher(plates)
+    return PlateWhitelistIndex(plates)
+
+
+license_plate_matcher = build_plate_matcher(license_plate_whitelist)
+
+# 白名单文件 (CSV 或 YAML，见 whitelist.py)，修改后自动重新加载，无需重启；
+# 未设置时使用上面的 license_plate_whitelist
+LPR_WHITELIST_FILE = os.getenv("LPR_WHITELIST_FILE")
+LPR_WHITELIST_POLL_INTERVAL = float(os.getenv("LPR_WHITELIST_POLL_INTERVAL", "2"))  # seconds
+
+
 CSV_HEADER = ["time", "license_number", "license_number_score", "open"]
 
 
+async def reload_whitelist(plates):
+    """在线程池中编译新的匹配器，然后整体替换，匹配阶段不会看到构建到一半的匹配器。"""
+    global license_plate_whitelist, license_plate_matcher
+    matcher = await asyncio.get_running_loop().run_in_executor(
+        None, build_plate_matcher, plates
+    )
+    license_plate_whitelist = plates
+    license_plate_matcher = matcher
+    print(f"白名单已加载: {len(plates)} 个车牌。")
+
+
+# 推理工作进程池，由 main() 在 LPR_INFERENCE_WORKERS > 0 时创建。
+# 工作进程中它始终为 None，下面的推理函数在工作进程里直接调用本进程加载的模型。
+inference_pool = None
+
+
+def _yolo_args(images, imgsz, rect):
+    """
+    YOLO 调用参数。imgsz 为 None 时使用模型默认设置；rect 为 True 且这一批图像
+    尺寸相同时按长宽比使用 (高, 宽) 的矩形输入，否则填充为 imgsz x imgsz。
+    """
+    if imgsz is None:
+        return {}
+    if rect and len({image.shape[:2] for image in images}) == 1:
+        height, width = images[0].shape[:2]
+        return {"imgsz": rect_imgsz(height, width, imgsz)}
+    return {"imgsz": imgsz}
+
+
+def predict_vehicle_boxes(frames, imgsz=None, rect=False):
+    """对一批帧运行 COCO 模型，返回每帧的 [x1, y1, x2, y2, score, class_id] 列表。"""
+    with metrics.observe_latency("coco_model"):
+        if inference_pool is not None:
+            return inference_pool.run(predict_vehicle_boxes, frames, imgsz=imgsz, rect=rect)
+        results = get_coco_model()(frames, **_yolo_args(frames, imgsz, rect))
+    return [result.boxes.data.tolist() for result in results]
+
+
+def predict_plate_boxes(images, imgsz=None, rect=False):
+    """对一批图像运行车牌检测器，返回每张图的 [x1, y1, x2, y2, score, class_id] 列表。"""
+    with metrics.observe_latency("license_plate_detector"):
+        if inference_pool is not None:
+            return inference_pool.run(predict_plate_boxes, images, imgsz=imgsz, rect=rect)
+        results = get_license_plate_detector()(images, **_yolo_args(images, imgsz, rect))
+    return [result.boxes.data.tolist() for result in results]
+
+
+def recognize_plates(crops):
+    """批量识别车牌裁剪图，返回 (text, score) 列表；启用工作进程池时在工作进程中识别。"""
+    if inference_pool is not None:
+        return inference_pool.run(recognize_plates, crops)
+    return read_license_plates(crops)
+
+
+def create_inference_pool():
+    """创建推理工作进程池，每个工作进程启动时加载一次全部模型 (阻塞)。"""
+    # 先在本进程中导出 ONNX / OpenVINO 模型，避免多个工作进程同时导出同一个文件
+    for path in (COCO_MODEL_PATH, LICENSE_PLATE_MODEL_PATH):
+        prepare_yolo_model(path)
+    return InferenceWorkerPool(
+        LPR_INFERENCE_WORKERS,
+        loader=load_models,
+        slots=LPR_WORKER_SLOTS,
+        slot_bytes=int(LPR_WORKER_SLOT_MB * 1024 * 1024),
+    ).start()
+
+
+# 所有摄像头共享的推理服务，每个模型只加载一次；
+# 使用工作进程池时每个服务最多同时有 LPR_INFERENCE_WORKERS 个批次在不同进程中推理
+vehicle_detection_service = BatchedInferenceService(
+    "coco",
+    predict_vehicle_boxes,
+    LPR_BATCH_MAX_SIZE,
+    LPR_BATCH_MAX_WAIT,
+    concurrency=max(1, LPR_INFERENCE_WORKERS),
+)
+plate_detection_service = BatchedInferenceService(
+    "plate",
+    predict_plate_boxes,
+    LPR_BATCH_MAX_SIZE,
+    LPR_BATCH_MAX_WAIT,
+    concurrency=max(1, LPR_INFERENCE_WORKERS),
+)
+
 
 def save_frame_to_jpg(
     frame_to_save, output_folder: str, filename_prefix: str = "frame"
@@ -43,118 +271,235 @@ def save_frame_to_jpg(
     output_folder: 用于保存 JPG 文件的文件夹路径。
     filename_prefix: 保存的 JPG 文件名的前缀。
 
+    图像在后台编码写入，调用后不要再修改 frame_to_save。
+
     返回:
-    bool: 如果保存成功则为 True，否则为 False。
-    str: 如果保存成功，则为完整的文件路径，否则为 None。
+    bool: 如果已提交保存则为 True，否则为 False。
+    str: 如果已提交保存，则为将要写入的完整文件路径，否则为 None。
     """
     if frame_to_save is None:
         print("错误：没有提供有效的帧进行保存。")
         return False, None
 
-    try:
-        # 如果输出文件夹不存在，则创建它
-        if not os.path.exists(output_folder):
-            os.makedirs(output_folder, exist_ok=True)
-            print(f"已创建输出文件夹: {output_folder}")
-    except OSError as e:
-        print(f"错误：创建输出文件夹 {output_folder} 失败: {e}")
-        return False, None
-
     # 生成一个基于时间戳的唯一文件名
     timestamp = time.strftime("%Y%m%d_%H%M%S_%f")  # %f 用于毫秒，确保更高唯一性
-    file_name = f"{filename_prefix}_{timestamp}.jpg"
-    full_file_path = os.path.join(output_folder, file_name)
+    file_name = f"{filename_prefix}_{timestamp}"
+    writer = get_evidence_writer()
+    # 编码和写盘在证据写入线程池中进行，JPEG 质量由 EVIDENCE_QUALITY 设置
+    writer.submit(output_folder, file_name, frame_to_save, "jpg")
+    return True, writer.path_for(output_folder, file_name, "jpg")
+
+
+# Global controller instance to maintain state
+_controller = None
+
+
+def get_garage_controller():
+    """返回共享的 MerossGarageController，首次调用时创建；缺少 Meross 配置时返回 None。"""
+    global _controller
+
+    if _controller is None:
+        email = os.environ.get("MEROSS_EMAIL")
+        password = os.environ.get("MEROSS_PASSWORD")
+        device_name = os.environ.get("MEROSS_GARAGE_DOOR_NAME")
+        if not email or not password or not device_name:
+            return None
+        _controller = MerossGarageController(
+            email=email,
+            password=password,
+            device_name=device_name,
+            keepalive_interval=MEROSS_KEEPALIVE_INTERVAL,
+            api_base_url=MEROSS_API_BASE_URL,
+            cache_path=MEROSS_SESSION_CACHE or None,
+        )
+    return _controller
+
+
+async def start_garage_controller():
+    """启动时登录 Meross 并启动后台保活任务，第一次开门时无需再等待登录和设备发现。"""
+    controller = get_garage_controller()
+    if controller is None:
+        print("警告: Meross 配置不完整，无法开门。")
+        return
+    started = time.perf_counter()
+    if not await controller.initialize():
+        print("警告: Meross 初始化失败，将在后台重试。")
+        controller.request_reconnect()
+    _startup_timings.append(("meross login and device discovery", time.perf_counter() - started))
+    controller.start_keepalive()
+
+
+async def open_garage_door():
+    controller = get_garage_controller()
+    if controller is None:
+        return -10
 
     try:
-        # 保存帧为 JPG 文件
-        # 您可以设置 JPEG 图像质量 (0-100，越高图像质量越好，文件越大)
-        # params = [cv2.IMWRITE_JPEG_QUALITY, 90] # 例如，质量设置为 90
-        # success = cv2.imwrite(full_file_path, frame_to_save, params)
-        success = cv2.imwrite(full_file_path, frame_to_save)  # 使用默认质量
-
-        if success:
-            print(f"帧已成功保存为: {full_file_path}")
-            return True, full_file_path
+        # 正常情况下会话已由保活任务验证，这里只有一次 async_open 调用；
+        # 仅当会话尚未建立时才在此处同步初始化
+        if not controller.is_ready and not await controller.initialize():
+            return -1
+        opened = await controller.open_door()
+        # Don't close connection to maintain state
+        if opened:
+            return 1
         else:
-            print(f"错误：保存帧到 {full_file_path} 失败 (cv2.imwrite 返回 False)。")
-            return False, None
+            return 0  # Cooldown or other failure
     except Exception as e:
-        print(f"保存帧时发生异常: {e}")
-        return False, None
+        print(f"Session error, reconnecting controller: {e}")
+        controller.request_reconnect()
+        return -1
+
+
+# 启动耗时记录: (步骤, 秒)
+_startup_timings = []
+# 已经预热过的 (宽, 高, 旋转) 组合
+_warmed_up = set()
 
 
-def initialize_capture(rtsp_url: str):
+def load_models():
+    """显式加载全部模型 (阻塞，在线程池中调用)，并记录每个模型的加载耗时。"""
+    for step, loader in (
+        ("load coco_model", get_coco_model),
+        ("load license_plate_detector", get_license_plate_detector),
+        ("load OCR recognizer", get_recognizer),
+    ):
+        started = time.perf_counter()
+        loader()
+        _startup_timings.append((step, time.perf_counter() - started))
+
+
+async def warmup_models(frame_width: int, frame_height: int, rotate_code):
     """
-    初始化并返回一个 VideoCapture 对象。
-    如果失败则返回 None。
+    用视频流实际分辨率的空白帧跑一遍检测器和 OCR，让第一帧真实画面
+    (包括重连之后) 不再付出冷启动推理的代价。同一分辨率只预热一次。
     """
-    print(f"正在连接到 RTSP 流: {rtsp_url} ...")
-    # 可选: 尝试为RTSP强制使用TCP传输 (某些OpenCV后端和网络环境下更稳定)
-    # os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "rtsp_transport;tcp"
-    cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)  # 尝试指定FFMPEG后端
-
-    if not cap.isOpened():
-        print(f"错误: 无法打开 RTSP 流位于 {rtsp_url}")
-        # 可以在这里添加更详细的错误检查提示
-        return None
+    key = (frame_width, frame_height, rotate_code)
+    if key in _warmed_up or frame_width <= 0 or frame_height <= 0:
+        return
+    _warmed_up.add(key)
+
+    dummy = rotate_frame(np.zeros((frame_height, frame_width, 3), np.uint8), rotate_code)
+    resolution = f"{dummy.shape[1]}x{dummy.shape[0]}"
+
+    # 车辆检测的两种输入尺寸都预热一遍
+    resolution_scheduler = create_resolution_scheduler()
+    for near in (False, True) if LPR_DYNAMIC_IMGSZ else (True,):
+        vehicle_args = resolution_scheduler.vehicle_args(near)
+        started = time.perf_counter()
+        await vehicle_detection_service.infer(dummy, **vehicle_args)
+        _startup_timings.append(
+            (
+                f"warmup coco_model {resolution} imgsz={vehicle_args['imgsz']}",
+                time.perf_counter() - started,
+            )
+        )
 
-    print("成功连接到 RTSP 流。")
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    print(
-        f"视频流属性: {width}x{height} @ {fps if fps > 0 else 'N/A'} FPS (摄像头报告值)"
+    # 级联模式下车牌检测器看到的是车辆裁剪图
+    plate_input = dummy[: dummy.shape[0] // 2, : dummy.shape[1] // 2] if LPR_CASCADE else dummy
+    started = time.perf_counter()
+    await plate_detection_service.infer(plate_input, **resolution_scheduler.plate_args())
+    _startup_timings.append(
+        (f"warmup license_plate_detector {resolution}", time.perf_counter() - started)
     )
-    return cap
 
-# Global controller instance to maintain state
-_controller = None
+    started = time.perf_counter()
+    await asyncio.get_running_loop().run_in_executor(
+        None, recognize_plates, [np.zeros((40, 120), np.uint8)]
+    )
+    _startup_timings.append(("warmup OCR recognizer", time.perf_counter() - started))
 
-async def open_garage_door():
-    global _controller
-    
-    email = os.environ.get("MEROSS_EMAIL") 
-    password = os.environ.get("MEROSS_PASSWORD")
-    device_name = os.environ.get("MEROSS_GARAGE_DOOR_NAME") 
 
-    if not email or not password or not device_name:
-        return -10
+async def print_startup_report_when_ready(ready_events):
+    """所有摄像头都完成首次连接和预热后打印一次启动耗时报告。"""
+    await asyncio.gather(*(event.wait() for event in ready_events))
+    print_startup_report()
 
-    # Reuse existing controller or create new one
-    if _controller is None:
-        _controller = MerossGarageController(email=email, password=password, device_name=device_name)
-    
-    try:
-        if await _controller.initialize():
-            opened = await _controller.open_door()
-            # Don't close connection to maintain state
-            if opened:
-                return 1
-            else:
-                return 0  # Cooldown or other failure
-        else:
-            return -1
-    except Exception as e:
-        print(f"Session error, resetting controller: {e}")
-        # Reset controller on session errors
-        if _controller:
-            try:
-                await _controller.close_connection()
-            except:
-                pass
-        _controller = None
-        return -1
 
+def print_startup_report():
+    print("启动耗时:")
+    for step, seconds in _startup_timings:
+        print(f"  {step:<48}{seconds * 1000:>10.1f} ms")
+    print(f"  {'total since startup':<48}{(time.perf_counter() - _PROCESS_START) * 1000:>10.1f} ms")
+
+
+async def detect_plates_in_vehicles(frame, vehicle_boxes, **plate_args):
+    """
+    在车辆区域内检测车牌：所有车辆裁剪图一起提交给共享的车牌检测服务批量推理，
+    返回映射回整帧坐标的 [x1, y1, x2, y2, score, class_id] 列表。
+    plate_args (imgsz, rect) 原样传给车牌检测器。
+    """
+    frame_height, frame_width = frame.shape[:2]
+    crops = []
+    offsets = []
+    for x1, y1, x2, y2, _ in vehicle_boxes:
+        # 稍微扩大车辆框，避免车牌贴边时被截断
+        margin_x = (x2 - x1) * VEHICLE_CROP_MARGIN
+        margin_y = (y2 - y1) * VEHICLE_CROP_MARGIN
+        cx1 = max(0, int(x1 - margin_x))
+        cy1 = max(0, int(y1 - margin_y))
+        cx2 = min(frame_width, int(x2 + margin_x))
+        cy2 = min(frame_height, int(y2 + margin_y))
+        if cx2 - cx1 < 2 or cy2 - cy1 < 2:
+            continue
+        crops.append(frame[cy1:cy2, cx1:cx2])
+        offsets.append((cx1, cy1))
+
+    if not crops:
+        return []
+
+    plate_boxes = []
+    crop_results = await plate_detection_service.infer_many(crops, **plate_args)
+    for result, (offset_x, offset_y) in zip(crop_results, offsets):
+        for x1, y1, x2, y2, score, class_id in result:
+            box = [x1 + offset_x, y1 + offset_y, x2 + offset_x, y2 + offset_y]
+            # 车辆框重叠时同一个车牌可能被检测两次，只保留第一个
+            if any(box_iou(box, kept[:4]) > 0.5 for kept in plate_boxes):
+                continue
+            plate_boxes.append(box + [score, class_id])
+    return plate_boxes
+
+
+def rotate_frame(frame, rotate_code):
+    """按摄像头配置旋转画面，rotate_code 为 None 时原样返回。"""
+    if rotate_code is None:
+        return frame
+    return cv2.rotate(frame, rotate_code)
+
+
+def crop_roi(frame, roi):
+    """
+    在旋转之前裁剪感兴趣区域，返回 (视图, 像素范围)。返回的是 NumPy 视图，不拷贝像素；
+    roi 为 None 时返回整幅画面和 None。
+    """
+    if roi is None:
+        return frame, None
+    x1, y1, x2, y2 = roi_to_pixels(roi, frame.shape[1], frame.shape[0])
+    return frame[y1:y2, x1:x2], (x1, y1, x2, y2)
+
+
+async def detect_stage(job: LprJob):
+    """
+    检测阶段：旋转画面，通过共享推理服务检测车辆和车牌 (与其他摄像头的帧合批)，
+    二值化车牌区域。
+    """
+    camera_label = f"[{job.camera_name}] " if job.camera_name else ""
+    print(f"{camera_label}处理帧: {job.capture_time_str}")
+    loop = asyncio.get_running_loop()
+    # 先裁剪 ROI 再旋转，只有 ROI 内的像素参与旋转和检测
+    source_height, source_width = job.frame.shape[:2]
+    roi_view, roi_pixels = crop_roi(job.frame, job.roi)
+    frame = await loop.run_in_executor(None, rotate_frame, roi_view, job.rotate_code)
+    job.frame = frame
+
+    # 按上一帧的车辆远近选择输入尺寸
+    resolution = job.scheduler.resolution if job.scheduler is not None else None
+    vehicle_args = resolution.vehicle_args() if resolution is not None else {}
+    plate_args = resolution.plate_args() if resolution is not None else {}
 
-async def process_frame_for_lpr(
-    frame, frame_capture_time_str, output_crop_dir, output_crop_thresh_dir
-):
-    print(f"处理帧: {frame_capture_time_str}")
-    # read frames
     # detect vehicles
-    detections = coco_model(frame)[0]
     detect_results = []
-    for detection in detections.boxes.data.tolist():
+    for detection in await vehicle_detection_service.infer(frame, **vehicle_args):
         x1, y1, x2, y2, score, class_id = detection
         if int(class_id) in vehicles:
             detect_results.append([x1, y1, x2, y2, score])
@@ -163,11 +508,41 @@ async def process_frame_for_lpr(
     detect_results_array = (
         np.asarray(detect_results) if len(detect_results) > 0 else np.empty((0, 5))
     )
+    if resolution is not None:
+        resolution.report_vehicle_boxes(detect_results_array, frame.shape[1], frame.shape[0])
+    if job.tracker is not None:
+        tracks = job.tracker.update(detect_results_array, job.capture_monotonic)
+    else:
+        tracks = [None] * len(detect_results_array)
+    # 车牌已确认的车辆不再检测和识别车牌
+    tracks_by_box = [
+        (box, track)
+        for box, track in zip(detect_results_array, tracks)
+        if track is None or track.needs_ocr
+    ]
+    if job.scheduler is not None:
+        # 只有车牌尚未确认的车辆才进入/延长 burst，停在画面里的已确认车辆不会让调度一直保持 burst
+        job.scheduler.report_vehicles(len(tracks_by_box), time.monotonic())
 
     # detect license plates
-    license_plates = license_plate_detector(frame)[0]
-    for license_plate in license_plates.boxes.data.tolist():
+    if LPR_CASCADE:
+        # 级联模式：没有车辆就跳过车牌检测，否则只在车辆区域内检测
+        if len(tracks_by_box) == 0:
+            return None
+        license_plate_boxes = await detect_plates_in_vehicles(
+            frame, [box for box, _ in tracks_by_box], **plate_args
+        )
+    else:
+        license_plate_boxes = await plate_detection_service.infer(frame, **plate_args)
+
+    for license_plate in license_plate_boxes:
         x1, y1, x2, y2, score, class_id = license_plate
+        track = VehicleTracker.track_for_box(tracks_by_box, license_plate)
+        if track is None and VehicleTracker.track_for_box(
+            zip(detect_results_array, tracks), license_plate
+        ):
+            # 车牌属于已确认车牌的车辆 (非级联模式下才会出现)
+            continue
 
         license_plate_crop = frame[int(y1) : int(y2), int(x1) : int(x2), :]
 
@@ -176,33 +551,361 @@ async def process_frame_for_lpr(
         _, license_plate_crop_thresh = cv2.threshold(
             license_plate_crop_gray, 64, 255, cv2.THRESH_BINARY_INV
         )
-        # Save the thresholded crop
-
-        # read license plate number
-        license_plate_text, license_plate_text_score = read_license_plate(
-            license_plate_crop_thresh
+        job.plates.append(
+            {
+                "bbox": [x1, y1, x2, y2],
+                # 整幅 (旋转后) 画面中的坐标，用于日志和证据
+                "frame_bbox": map_box_to_frame(
+                    [x1, y1, x2, y2],
+                    roi_pixels,
+                    job.rotate_code,
+                    source_width,
+                    source_height,
+                ),
+                "bbox_score": score,
+                "crop_thresh": license_plate_crop_thresh,
+                "track": track,
+            }
         )
+
+    return job if job.plates else None
+
+
+def ocr_stage(job: LprJob):
+    """OCR 阶段 (CPU 密集，在线程池中运行)：一次批量识别这一帧所有车牌的文字。"""
+    ocr_results = [None] * len(job.plates)
+    if job.ocr_cache is not None:
+        # 与最近识别过的车牌裁剪图相同时直接复用结果
+        hashes = [
+            dhash(plate["crop_thresh"]) if plate["crop_thresh"].size else None
+            for plate in job.plates
+        ]
+        for index, plate in enumerate(job.plates):
+            if hashes[index] is not None:
+                ocr_results[index] = job.ocr_cache.lookup(
+                    hashes[index], plate["bbox"], job.capture_monotonic
+                )
+    pending = [index for index, result in enumerate(ocr_results) if result is None]
+    # 缓存命中的结果只是上一次识别的重复，不能作为新的一票参与车牌确认
+    cached = set(range(len(ocr_results))) - set(pending)
+
+    # read license plate number
+    if pending:
+        for index, result in zip(
+            pending, recognize_plates([job.plates[i]["crop_thresh"] for i in pending])
+        ):
+            ocr_results[index] = result
+            if job.ocr_cache is not None and hashes[index] is not None:
+                job.ocr_cache.store(
+                    hashes[index], job.plates[index]["bbox"], result, job.capture_monotonic
+                )
+
+    recognized = []
+    for index, (plate, (license_plate_text, license_plate_text_score)) in enumerate(
+        zip(job.plates, ocr_results)
+    ):
         if license_plate_text is not None:
-            door_open = 0
-            if is_string_similar_to_any_in_list(
-                license_plate_text, license_plate_whitelist, 80
-            ):
-                # leave evidence
-                crop_thresh_filename = os.path.join(
-                    output_crop_thresh_dir,
-                    f"{frame_capture_time_str}_car_thresh.png",
+            plate["raw_text"] = license_plate_text
+            plate["text"] = license_plate_text
+            plate["text_score"] = license_plate_text_score
+            plate["ocr_cached"] = index in cached
+            if plate.get("track") is not None and job.tracker is not None:
+                if plate["ocr_cached"]:
+                    # 不投票，沿用这辆车当前的融合结果
+                    fused_text, _ = plate["track"].fused_plate()
+                    plate["text"] = fused_text or license_plate_text
+                else:
+                    # 与这辆车之前的识别结果做加权投票，用融合后的文字去匹配
+                    plate["text"], _ = job.tracker.add_plate_read(
+                        plate["track"], license_plate_text, license_plate_text_score
+                    )
+            recognized.append(plate)
+    job.plates = recognized
+    return job if job.plates else None
+
+
+def match_stage(job: LprJob):
+    """匹配阶段：整批与白名单比对，匹配成功的车牌留存二值化图像作为证据。"""
+    matched = []
+    with metrics.observe_latency("match"):
+        matches = license_plate_matcher.best_matches(
+            [plate["text"] for plate in job.plates], WHITELIST_CONFIDENCE_PERCENT
+        )
+    for plate, (whitelist_plate, match_score) in zip(job.plates, matches):
+        if whitelist_plate is not None:
+            # leave evidence
+            camera_part = f"_{job.camera_name}" if job.camera_name else ""
+            # 在证据写入线程池中编码写盘，超出 EVIDENCE_MAX_MB 时删除最旧的证据
+            get_evidence_writer().submit(
+                job.output_crop_thresh_dir,
+                f"{job.capture_time_str}{camera_part}_car_thresh",
+                plate["crop_thresh"],
+            )
+            plate["matched"] = True
+            plate["whitelist_plate"] = whitelist_plate
+            plate["match_score"] = match_score
+            camera_label = f"[{job.camera_name}] " if job.camera_name else ""
+            frame_bbox = [int(value) for value in plate["frame_bbox"]]
+            print(
+                f"{camera_label}白名单匹配: {plate['text']} -> {whitelist_plate} "
+                f"({match_score:.0%})，位置 {frame_bbox}"
+            )
+            matched.append(plate)
+    job.plates = matched
+    return job if job.plates else None
+
+
+def _door_cooldown_allows() -> bool:
+    """冷却时间检查，在开门请求入队之前调用。"""
+    controller = get_garage_controller()
+    return controller is None or controller.can_open_door()
+
+
+# 开门命令队列: 检测流水线不等待 Meross 云端往返，重复的开门请求合并为一次
+door_dispatcher = DoorCommandDispatcher(open_garage_door, _door_cooldown_allows)
+
+
+def _log_door_result(capture_time_str, plate_text, plate_text_score, door_open):
+    if door_open == 1:
+        data_row = [
+            capture_time_str,
+            plate_text,
+            plate_text_score,
+            door_open,
+        ]
+        write_log_entry(data_row, CSV_HEADER)
+
+
+async def actuate_stage(job: LprJob):
+    """执行阶段：为匹配的车牌提交开门请求，命令执行完后记录 CSV 日志。"""
+    for plate in job.plates:
+        # open the garage door
+        door_dispatcher.request_open(
+            functools.partial(
+                _log_door_result, job.capture_time_str, plate["text"], plate["text_score"]
+            )
+        )
+    return None
+
+
+LPR_STAGES = [
+    PipelineStage("detect", detect_stage),
+    PipelineStage("ocr", ocr_stage, blocking=True),
+    PipelineStage("match", match_stage, blocking=True),
+    PipelineStage("actuate", actuate_stage),
+]
+
+
+def _log_stage_error(stage_name, job, e):
+    # write error into log.txt
+    camera_label = f"[{job.camera_name}] " if job.camera_name else ""
+    write_log_to_txt(
+        f"{job.capture_time_str} {camera_label}Error processing frame ({stage_name}): {e}"
+    )
+
+
+def create_tracker() -> VehicleTracker:
+    return VehicleTracker(
+        max_age=LPR_TRACK_MAX_AGE, confirm_reads=LPR_TRACK_CONFIRM_READS
+    )
+
+
+def create_ocr_cache():
+    if not LPR_OCR_CACHE:
+        return None
+    return PlateOcrCache(ttl=LPR_OCR_CACHE_TTL, max_hamming=LPR_OCR_CACHE_MAX_HAMMING)
+
+
+def create_scheduler(camera=None) -> LprScheduler:
+    """按摄像头配置创建调度器，摄像头未设置的参数使用全局默认值。"""
+
+    def setting(name, default):
+        value = getattr(camera, name, None) if camera is not None else None
+        return default if value is None else value
+
+    return LprScheduler(
+        idle_interval=setting("idle_interval", LPR_PROCESSING_INTERVAL),
+        burst_interval=setting("burst_interval", LPR_BURST_INTERVAL),
+        burst_duration=setting("burst_duration", LPR_BURST_DURATION),
+        motion_gate=MotionGate(
+            downscale_width=MOTION_DOWNSCALE_WIDTH,
+            pixel_threshold=MOTION_PIXEL_THRESHOLD,
+            min_area_ratio=MOTION_MIN_AREA_RATIO,
+        ),
+        motion_check_interval=MOTION_CHECK_INTERVAL,
+        resolution=create_resolution_scheduler(),
+    )
+
+
+def create_resolution_scheduler() -> InferenceResolutionScheduler:
+    """按环境变量创建输入尺寸调度器；关闭 LPR_DYNAMIC_IMGSZ 时车辆检测始终使用 LPR_VEHICLE_IMGSZ_NEAR。"""
+    return InferenceResolutionScheduler(
+        presence_imgsz=LPR_VEHICLE_IMGSZ if LPR_DYNAMIC_IMGSZ else LPR_VEHICLE_IMGSZ_NEAR,
+        near_imgsz=LPR_VEHICLE_IMGSZ_NEAR,
+        plate_imgsz=LPR_PLATE_IMGSZ,
+        near_area_ratio=LPR_NEAR_VEHICLE_AREA,
+        vehicle_rect=LPR_VEHICLE_RECT,
+        plate_rect=LPR_PLATE_RECT,
+    )
+
+
+async def run_camera(camera, output_crop_dir, output_crop_thresh_dir, ready=None):
+    """
+    单路摄像头的读帧与调度循环，帧交给这路摄像头自己的流水线处理。
+    首次连接并预热完成后设置 ready (asyncio.Event)。
+    """
+    camera_label = f"[{camera.name}] " if camera.name else ""
+    supervisor = StreamSupervisor(
+        name=camera.name or "main",
+        ffmpeg_options=LPR_FFMPEG_OPTIONS or None,
+        retrieve_on_demand=LPR_RETRIEVE_ON_DEMAND,
+        stall_timeout=STREAM_STALL_TIMEOUT,
+        backoff_initial=RECONNECT_BACKOFF_INITIAL,
+        backoff_max=RECONNECT_BACKOFF_MAX,
+    )
+
+    # 当前使用的 ROI: 像素 ROI 按主码流分辨率换算成比例，切换到子码流后仍指向同一块区域
+    roi = camera.roi
+
+    async def open_stream(url, reconnect=False):
+        nonlocal roi
+        # 连接失败时按退避时间无限重试，不阻塞事件循环
+        if reconnect:
+            grabber = await supervisor.reconnect(url)
+        else:
+            grabber = await supervisor.open(url)
+        frame_width, frame_height = grabber.frame_size
+        if url == camera.url:
+            roi = roi_to_fractions(camera.roi, frame_width, frame_height)
+        if roi is not None and frame_width > 0 and frame_height > 0:
+            # 检测器看到的是裁剪后的 ROI
+            x1, y1, x2, y2 = roi_to_pixels(roi, frame_width, frame_height)
+            frame_width, frame_height = x2 - x1, y2 - y1
+        if LPR_WARMUP:
+            # 分辨率变化时重新预热，相同分辨率会直接跳过
+            await warmup_models(frame_width, frame_height, camera.rotate_code)
+        return grabber
+
+    # 先连接主码流，按主码流分辨率预热；空闲后再切换到子码流
+    stream_url = camera.url
+    grabber = await open_stream(stream_url)
+    print(f"{camera_label}Connected to RTSP stream successfully.")
+    if ready is not None:
+        ready.set()
+    pipeline = LprPipeline(LPR_STAGES, on_error=_log_stage_error).start()
+    scheduler = create_scheduler(camera)
+    scheduler.reset(time.monotonic())
+    tracker = create_tracker()
+    ocr_cache = create_ocr_cache()
+    last_frame_seq = 0
+    main_stream_since = time.monotonic()
+    # 刚切换到主码流时，第一帧不经过调度判断直接处理
+    force_process = False
+
+    async def switch_stream(url):
+        nonlocal grabber, stream_url, last_frame_seq, main_stream_since, force_process
+        on_main = url == camera.url
+        print(f"{camera_label}切换到{'主码流' if on_main else '子码流'}。")
+        stream_url = url
+        grabber = await open_stream(url)
+        # 两路码流分辨率不同，跟踪框和运动背景都要重新开始
+        last_frame_seq = 0
+        tracker.reset()
+        if ocr_cache is not None:
+            ocr_cache.clear()
+        if scheduler.motion_gate is not None:
+            scheduler.motion_gate.reset()
+        main_stream_since = time.monotonic()
+        force_process = on_main
+
+    try:
+        while True:
+            now = time.monotonic()
+            if camera.substream_url:
+                # 主码流空闲超过 burst_duration 后切到子码流；子码流上发现车辆后切回主码流
+                if stream_url == camera.url:
+                    if (
+                        scheduler.mode == LprScheduler.IDLE
+                        and now - main_stream_since >= scheduler.burst_duration
+                    ):
+                        await switch_stream(camera.substream_url)
+                        continue
+                elif scheduler.mode == LprScheduler.BURST:
+                    await switch_stream(camera.url)
+                    continue
+
+            # 等到下一个检查时刻再取帧，读帧线程始终保留最新一帧
+            wait_time = 0 if force_process else scheduler.next_check_delay(now)
+            if wait_time > 0:
+                await asyncio.sleep(wait_time)
+
+            frame, frame_time, frame_seq = await grabber.next_frame(
+                last_frame_seq, timeout=FRAME_WAIT_TIMEOUT
+            )
+            if grabber.failed:
+                print(f"{camera_label}错误: 无法读取视频帧，正在重新连接...")
+                grabber = await open_stream(stream_url, reconnect=True)
+                print(f"{camera_label}Reconnected to RTSP stream successfully.")
+                last_frame_seq = 0
+                scheduler.reset(time.monotonic())
+                tracker.reset()
+                if ocr_cache is not None:
+                    ocr_cache.clear()
+                continue
+            if frame is None or frame_seq == last_frame_seq:
+                continue
+            last_frame_seq = frame_seq
+
+            current_time_monotonic = time.monotonic()
+            # 运动检测也只看 ROI，ROI 外的树影、路人不会触发检测
+            process, reason = scheduler.should_process(
+                crop_roi(frame, roi)[0], current_time_monotonic
+            )
+            if force_process:
+                process, reason, force_process = True, "stream", False
+            elif reason == "motion" and stream_url != camera.url:
+                # 子码流上检测到运动: 切换到主码流，用高分辨率帧识别车牌
+                print(f"{camera_label}检测到运动，切换到主码流。")
+                await switch_stream(camera.url)
+                continue
+            if not process:
+                continue
+
+            # 使用帧的实际采集时间而不是处理时间
+            current_time_display_str = time.strftime(
+                "%Y-%m-%d %H:%M:%S",
+                time.localtime(time.time() - (current_time_monotonic - frame_time)),
+            )
+
+            # 交给流水线，检测/OCR 不阻塞事件循环
+            metrics.increment("frames_processed")
+            if not pipeline.submit(
+                LprJob(
+                    frame=frame,
+                    capture_time_str=current_time_display_str,
+                    capture_monotonic=frame_time,
+                    output_crop_dir=output_crop_dir,
+                    output_crop_thresh_dir=output_crop_thresh_dir,
+                    scheduler=scheduler,
+                    tracker=tracker,
+                    ocr_cache=ocr_cache,
+                    camera_name=camera.name,
+                    rotate_code=camera.rotate_code,
+                    roi=roi,
                 )
-                cv2.imwrite(crop_thresh_filename, license_plate_crop_thresh)
-                # open the garage door
-                door_open = await open_garage_door()
-            if door_open == 1:
-                data_row = [
-                    frame_capture_time_str,
-                    license_plate_text,
-                    license_plate_text_score,
-                    door_open,
-                ]
-                write_log_entry(data_row, CSV_HEADER)
+            ):
+                metrics.increment("frames_dropped")
+                print(f"{camera_label}流水线繁忙，已丢弃尚未处理的旧帧。")
+            if reason == "motion":
+                motion_ratio = scheduler.motion_gate.last_motion_ratio
+                print(f"{camera_label}检测到运动 ({motion_ratio:.3f})，运行检测器。")
+            scheduler.mark_processed(current_time_monotonic)
+
+    except KeyboardInterrupt:
+        print("用户中断，退出程序。")
+    finally:
+        await supervisor.close()
+        await pipeline.stop()
 
 
 async def main():
@@ -215,65 +918,76 @@ async def main():
     if not os.path.exists(output_crop_thresh_dir):
         os.makedirs(output_crop_thresh_dir)
 
-    if not rtsp_url:
+    # 证据文件索引: 启动时扫描一次已有文件，之后按配额清理时只看索引
+    evidence_writer = get_evidence_writer()
+    evidence_writer.register_directory(output_crop_dir)
+    evidence_writer.register_directory(output_crop_thresh_dir)
+
+    try:
+        cameras = load_camera_configs(cameras_file, rtsp_url, rtsp_substream_url, LPR_ROI)
+    except (OSError, ValueError) as e:
+        print(f"错误: 无法读取摄像头配置 '{cameras_file}': {e}")
+        return
+    if not cameras:
         print("错误: RTSP_URL 环境变量未设置。")
         return
 
-    cap = initialize_capture(rtsp_url)
-    if cap is None:
-        print("错误: 无法初始化视频捕获。")
-        return
-    print("Connected to RTSP stream successfully.")
+    if METRICS_PORT:
+        metrics.start_metrics_server(METRICS_PORT)
 
-    last_lpr_processed_time = time.monotonic()
+    # 在处理第一帧之前加载全部模型 (多进程模式下由每个工作进程各自加载)
+    global inference_pool
+    if LPR_INFERENCE_WORKERS > 0:
+        started = time.perf_counter()
+        inference_pool = await asyncio.get_running_loop().run_in_executor(
+            None, create_inference_pool
+        )
+        _startup_timings.append(
+            (f"start {LPR_INFERENCE_WORKERS} inference workers", time.perf_counter() - started)
+        )
+    else:
+        await asyncio.get_running_loop().run_in_executor(None, load_models)
 
-    try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("错误: 无法读取视频帧。")
-                print("Reconnecting after 5s...")
-                time.sleep(5)
-                cap.release()
-                cap = initialize_capture(rtsp_url)
-                if cap is None:
-                    print("错误: 无法重新连接到视频流。")
-                    break
-                print("Reconnected to RTSP stream successfully.")
-                last_lpr_processed_time = time.monotonic()
-                continue
+    await start_garage_controller()
 
-            current_time_monotonic = time.monotonic()
-            current_time_display_str = time.strftime(
-                "%Y-%m-%d %H:%M:%S", time.localtime()
+    whitelist_watcher = None
+    if LPR_WHITELIST_FILE:
+        whitelist_watcher = WhitelistWatcher(
+            LPR_WHITELIST_FILE, reload_whitelist, LPR_WHITELIST_POLL_INTERVAL
+        )
+        if not await whitelist_watcher.check():
+            print(f"警告: 白名单文件 '{LPR_WHITELIST_FILE}' 不存在或无法读取，使用内置白名单。")
+        whitelist_watcher.start()
+
+    vehicle_detection_service.start()
+    plate_detection_service.start()
+    # 启动报告与是否预热无关: 所有摄像头完成首次连接 (以及预热) 后打印一次
+    ready_events = [asyncio.Event() for _ in cameras]
+    startup_report_task = asyncio.create_task(
+        print_startup_report_when_ready(ready_events), name="startup-report"
+    )
+    try:
+        await asyncio.gather(
+            *(
+                run_camera(camera, output_crop_dir, output_crop_thresh_dir, ready)
+                for camera, ready in zip(cameras, ready_events)
             )
-
-            if (
-                current_time_monotonic - last_lpr_processed_time
-            ) >= LPR_PROCESSING_INTERVAL:
-                # rotate the frame 90 degrees
-                frame_rotated = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-                try:
-                    await process_frame_for_lpr(
-                        frame_rotated.copy(),
-                        current_time_display_str,
-                        output_crop_dir,
-                        output_crop_thresh_dir,
-                    )
-                except Exception as e:
-                    # write error into log.txt
-                    with open("log.txt", "a") as f:
-                        f.write(
-                            f"{current_time_display_str} Error processing frame: {e}\n"
-                        )
-                finally:
-                    last_lpr_processed_time = current_time_monotonic
-
-    except KeyboardInterrupt:
-        print("用户中断，退出程序。")
+        )
     finally:
-        if cap:
-            cap.release()
+        startup_report_task.cancel()
+        if whitelist_watcher is not None:
+            await whitelist_watcher.stop()
+        await door_dispatcher.stop()
+        await vehicle_detection_service.stop()
+        await plate_detection_service.stop()
+        if inference_pool is not None:
+            inference_pool.close()
+        if _controller is not None:
+            await _controller.stop_keepalive()
+            # 不注销，保留缓存的会话供下次启动复用
+            await _controller.close_connection(logout=False)
+        get_evidence_writer().close()
+        get_log_sink().close()
         print("program terminated.")
 
 
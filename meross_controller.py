@@ -1,17 +1,75 @@
 # meross_controller.py
 
 import asyncio
+import json
 import os
 import time
 from meross_iot.http_api import MerossHttpClient
 from meross_iot.manager import MerossManager
+from meross_iot.model.credentials import MerossCloudCreds
 from meross_iot.model.enums import OnlineStatus, Namespace
 from dotenv import load_dotenv
 from util import write_log_to_txt
+import metrics
 from datetime import datetime
 
+DEFAULT_API_BASE_URL = "https://iotx-us.meross.com"
+
+
+class MerossSessionCache:
+    """
+    On-disk cache of the Meross cloud credentials (token) and the resolved garage door device.
+
+    Lets a restart or reconnect reuse the existing session and go straight to the known
+    device instead of logging in and enumerating every device on the account again.
+    The file holds a session token, so it is written with owner-only permissions.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self, email: str, api_base_url: str):
+        """Returns (MerossCloudCreds, device dict) or (None, None) if missing, unreadable or for another account."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("email") != email or data.get("api_base_url") != api_base_url:
+                return None, None
+            return MerossCloudCreds.from_json(data["credentials"]), data.get("device")
+        except FileNotFoundError:
+            return None, None
+        except Exception as e:
+            print(f"Ignoring invalid Meross session cache '{self.path}': {e}")
+            return None, None
+
+    def save(self, email: str, api_base_url: str, credentials, device):
+        data = {
+            "email": email,
+            "api_base_url": api_base_url,
+            "credentials": credentials.to_json(),
+            "device": {"uuid": device.uuid, "name": device.name, "type": device.type},
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not write Meross session cache '{self.path}': {e}")
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Could not remove Meross session cache '{self.path}': {e}")
+
+
 class MerossGarageController:
-    def __init__(self, email: str, password: str, device_name: str, cooldown_seconds=120):
+    def __init__(self, email: str, password: str, device_name: str, cooldown_seconds=120, keepalive_interval=60,
+                 api_base_url: str = None, cache_path: str = None):
         if not email or not password or not device_name:
             raise ValueError("Meross email, password, and device name must be provided.")
         self.email = email
@@ -21,24 +79,54 @@ class MerossGarageController:
         self.manager = None
         self.garage_device = None
         self._initialized_successfully = False # Renamed for clarity
+
+        # API base URL is configurable so the controller can be pointed at a local stand-in
+        self.api_base_url = api_base_url or DEFAULT_API_BASE_URL
+        self.session_cache = MerossSessionCache(cache_path) if cache_path else None
         
         # Cooldown management
         self.last_open_time = 0.0
         self.cooldown_seconds = cooldown_seconds
 
+        # Background keepalive: keeps the session and device state fresh so that
+        # open_door() is a single async_open call on an already-verified device
+        self.keepalive_interval = keepalive_interval
+        self._keepalive_task = None
+        self._reconnect_requested = asyncio.Event()
+        self._init_lock = asyncio.Lock()
+        self.last_verified_time = 0.0
+
+    @property
+    def is_ready(self) -> bool:
+        """True if the session is up and the device was online at the last check (no network I/O)."""
+        return (
+            self._initialized_successfully
+            and self.garage_device is not None
+            and self.garage_device.online_status == OnlineStatus.ONLINE
+        )
+
     async def initialize(self) -> bool:
         """
         Initializes the connection to Meross cloud, discovers devices,
         and selects the target garage door.
         Returns True if initialization was successful and device is ready, False otherwise.
         """
-        if self._initialized_successfully and self.garage_device and self.garage_device.online_status == OnlineStatus.ONLINE:
-            print("Meross controller already initialized and device is online.")
+        async with self._init_lock:
+            if self.is_ready:
+                return True
+            return await self._initialize_locked()
+
+    async def _initialize_locked(self) -> bool:
+        # Drop any half-open session from a previous attempt, keeping the token for reuse
+        if self.manager:
+            await self.close_connection(logout=False)
+
+        if await self._restore_cached_session():
             return True
 
         try:
             print(f"Attempting to authenticate with Meross email: {self.email}...")
-            self.http_client = await MerossHttpClient.async_from_user_password(email=self.email, password=self.password, api_base_url="https://iotx-us.meross.com")
+            self.http_client = await MerossHttpClient.async_from_user_password(email=self.email, password=self.password, api_base_url=self.api_base_url)
             print("Authenticated successfully. Initializing manager and discovering devices...")
             self.manager = MerossManager(http_client=self.http_client)
             await self.manager.async_init()
@@ -64,6 +152,9 @@ class MerossGarageController:
                 self.garage_device = found_device
                 print(f"Successfully found and selected garage door: '{self.garage_device.name}'")
                 self._initialized_successfully = True
+                self.last_verified_time = time.monotonic()
+                if self.session_cache:
+                    self.session_cache.save(self.email, self.api_base_url, self.http_client.cloud_credentials, found_device)
                 return True
             else:
                 print(f"Could not find an online garage door named '{self.device_name}' with required capabilities.")
@@ -77,27 +168,112 @@ class MerossGarageController:
             self._initialized_successfully = False
             return False
 
+    async def _restore_cached_session(self) -> bool:
+        """Reuses the cached token and device UUID. Returns False (and clears the cache) if they no longer work."""
+        if not self.session_cache:
+            return False
+        credentials, device_info = self.session_cache.load(self.email, self.api_base_url)
+        if credentials is None or not device_info or device_info.get("name") != self.device_name:
+            return False
+
+        try:
+            print(f"Restoring cached Meross session for device '{device_info['name']}'...")
+            self.http_client = MerossHttpClient(cloud_credentials=credentials, api_base_url=self.api_base_url)
+            self.manager = MerossManager(http_client=self.http_client)
+            await self.manager.async_init()
+            # Only the known device is set up; an expired token fails here
+            await self.manager.async_device_discovery(meross_device_uuid=device_info["uuid"])
+            devices = self.manager.find_devices(device_uuids=[device_info["uuid"]])
+            device = devices[0] if devices else None
+            if device is None or device.name != self.device_name or device.online_status != OnlineStatus.ONLINE:
+                raise RuntimeError("cached device not found or offline")
+        except Exception as e:
+            print(f"Cached Meross session is no longer valid ({e}). Falling back to full login...")
+            self.session_cache.clear()
+            await self.close_connection(logout=False)
+            return False
+
+        self.garage_device = device
+        print(f"Restored cached session and selected garage door: '{device.name}'")
+        self._initialized_successfully = True
+        self.last_verified_time = time.monotonic()
+        return True
+
     async def _ensure_initialized(self) -> bool:
-        """Checks if initialized and device is online, re-initializes if necessary."""
-        if not self._initialized_successfully or \
-           self.garage_device is None or \
-           self.garage_device.online_status != OnlineStatus.ONLINE:
-            print("Controller not initialized or device offline. Attempting to initialize...")
-            return await self.initialize()
-        
-        # Additional session health check
+        """Checks if initialized and device is online, re-initializes if necessary.
+
+        The session health check runs in the keepalive task, not here, so this is
+        free when the controller is ready.
+        """
+        if self.is_ready:
+            return True
+        print("Controller not initialized or device offline. Attempting to initialize...")
+        return await self.initialize()
+
+    async def _verify_session(self) -> bool:
+        """Refreshes the device state over the current session. Returns False if the session is unhealthy."""
         try:
-            # Try a simple operation to verify session is still valid
-            if hasattr(self.garage_device, 'get_status'):
-                await self.garage_device.async_get_status()
+            await self.garage_device.async_update()
         except Exception as e:
-            print(f"Session health check failed: {e}. Re-initializing...")
-            self._initialized_successfully = False
-            return await self.initialize()
-        
+            print(f"Session health check failed: {e}")
+            return False
+        if self.garage_device.online_status != OnlineStatus.ONLINE:
+            print(f"Garage door '{self.garage_device.name}' is offline.")
+            return False
+        self.last_verified_time = time.monotonic()
         return True
 
-    def _can_open_door(self) -> bool:
+    async def _keepalive_loop(self):
+        retry_delay = 5
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._reconnect_requested.wait(), timeout=self.keepalive_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._reconnect_requested.clear()
+
+            try:
+                healthy = self.is_ready and await self._verify_session()
+                if not healthy:
+                    self._initialized_successfully = False
+                    print("Meross keepalive: re-initializing session...")
+                    healthy = await self.initialize()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Meross keepalive error: {e}")
+                healthy = False
+
+            if healthy:
+                retry_delay = 5
+            else:
+                # Retry sooner than the regular interval, backing off up to the interval
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, self.keepalive_interval)
+                self._reconnect_requested.set()
+
+    def start_keepalive(self):
+        """Starts the background keepalive task (call from the running event loop)."""
+        if self._keepalive_task is None or self._keepalive_task.done():
+            self._keepalive_task = asyncio.create_task(
+                self._keepalive_loop(), name="meross-keepalive"
+            )
+        return self._keepalive_task
+
+    async def stop_keepalive(self):
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            await asyncio.gather(self._keepalive_task, return_exceptions=True)
+            self._keepalive_task = None
+
+    def request_reconnect(self):
+        """Marks the session as broken and wakes the keepalive task to reconnect now."""
+        self._initialized_successfully = False
+        self._reconnect_requested.set()
+
+    def can_open_door(self) -> bool:
         """Check if enough time has passed since last door open."""
         if self.last_open_time <= 0:
             return True
@@ -112,7 +288,7 @@ class MerossGarageController:
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # Check cooldown first
-        if not self._can_open_door():
+        if not self.can_open_door():
             print(f"Door open request ignored: still within {self.cooldown_seconds}s cooldown period.")
             return False
         
@@ -123,7 +299,9 @@ class MerossGarageController:
         
         try:
             print(f"Sending 'open' command to '{self.garage_device.name}'...")
-            await self.garage_device.async_open(channel=0) # open=1 for open
+            metrics.increment("door_commands")
+            with metrics.observe_latency("meross_open_door"):
+                await self.garage_device.async_open(channel=0) # open=1 for open
             print(f"'{self.garage_device.name}' open command sent.")
             # Record the successful open for cooldown
             self._record_door_open()
@@ -131,7 +309,7 @@ class MerossGarageController:
         except Exception as e:
             print(f"Error opening garage door '{self.garage_device.name}': {e}")
             write_log_to_txt(f"{current_time} Error opening garage door '{self.garage_device.name}': {e}")
-            self._initialized_successfully = False # Mark for re-initialization on next call
+            self.request_reconnect() # Reconnect in the background before the next call
             return False
 
     async def close_door(self) -> bool:
@@ -147,17 +325,23 @@ class MerossGarageController:
             return True
         except Exception as e:
             print(f"Error closing garage door '{self.garage_device.name}': {e}")
-            self._initialized_successfully = False # Mark for re-initialization on next call
+            self.request_reconnect() # Reconnect in the background before the next call
             return False
 
-    async def close_connection(self):
-        """Logs out from Meross cloud and cleans up resources."""
+    async def close_connection(self, logout: bool = True):
+        """Closes the Meross connection and cleans up resources.
+
+        With logout=False the cloud token stays valid so the cached session can be reused.
+        """
         if self.manager:
-            print("Closing Meross connection and logging out...")
+            print("Closing Meross connection" + (" and logging out..." if logout else "..."))
             try:
                 self.manager.close()
-                await self.http_client.async_logout()
-                print("Successfully logged out from Meross.")
+                if logout:
+                    await self.http_client.async_logout()
+                    if self.session_cache:
+                        self.session_cache.clear()
+                    print("Successfully logged out from Meross.")
             except Exception as e:
                 print(f"Error during Meross logout: {e}")
         self.garage_device = None
@@ -190,7 +374,8 @@ async def _test_module():
         print("Test credentials not found. Please set MEROSS_EMAIL_TEST and MEROSS_PASSWORD_TEST or edit _test_module.")
         return
 
-    controller = MerossGarageController(email=email, password=password, device_name=device_name)
+    controller = MerossGarageController(email=email, password=password, device_name=device_name,
+                                        api_base_url=os.environ.get("MEROSS_API_BASE_URL"))
     
     if await controller.initialize():
         print("\n--- Test: Opening Door ---")
@@ -0,0 +1,180 @@
+"""
+热路径指标: 各阶段延迟直方图与计数器，通过本地 HTTP 端点以 Prometheus 文本格式导出。
+
+用法:
+    from metrics import observe_latency, increment
+
+    with observe_latency("ocr"):
+        ...
+    increment("frames_read")
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_PREFIX = "garage_lpr"
+
+# 秒，覆盖从几毫秒的匹配到数秒的 Meross 云端往返
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    """累积直方图，线程安全。"""
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self._counts):
+                self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def render(self, labels: str = "") -> list[str]:
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+            total_count = self._count
+        lines = []
+        cumulative = 0
+        separator = "," if labels else ""
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append(
+                f'{self.name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}'
+            )
+        lines.append(f'{self.name}_bucket{{{labels}{separator}le="+Inf"}} {total_count}')
+        label_block = f"{{{labels}}}" if labels else ""
+        lines.append(f"{self.name}_sum{label_block} {total_sum}")
+        lines.append(f"{self.name}_count{label_block} {total_count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    延迟直方图 (按 stage 标签区分) 与计数器的集合。
+    所有方法都是线程安全的，可以在读帧线程、推理线程和事件循环中调用。
+    """
+
+    def __init__(self, prefix: str = METRIC_PREFIX):
+        self.prefix = prefix
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = Histogram(
+                    f"{self.prefix}_stage_latency_seconds",
+                    "Latency of each hot-path stage in seconds.",
+                )
+                self._histograms[stage] = histogram
+        histogram.observe(seconds)
+
+    def increment(self, name: str, amount: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def counter_value(self, name: str):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def render(self) -> str:
+        """Prometheus 文本格式 (exposition format 0.0.4)。"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        lines = []
+        if histograms:
+            name = histograms[0][1].name
+            lines.append(f"# HELP {name} {histograms[0][1].help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for stage, histogram in histograms:
+                lines.extend(histogram.render(f'stage="{stage}"'))
+        for counter_name, value in counters:
+            full_name = f"{self.prefix}_{counter_name}_total"
+            lines.append(f"# TYPE {full_name} counter")
+            lines.append(f"{full_name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def observe(stage: str, seconds: float):
+    registry.observe(stage, seconds)
+
+
+def increment(name: str, amount: float = 1):
+    registry.increment(name, amount)
+
+
+@contextmanager
+def observe_latency(stage: str):
+    """记录 with 块的耗时到 stage 直方图 (即使抛出异常也会记录)。"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(stage, time.perf_counter() - start)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 不在控制台打印每次抓取
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    """在后台线程中启动 /metrics HTTP 端点，返回 server 对象 (失败时返回 None)。"""
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"错误: 无法在 {host}:{port} 启动指标端点: {e}")
+        return None
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever, name="metrics-http", daemon=True
+    )
+    thread.start()
+    print(f"指标端点已启动: http://{host}:{port}/metrics")
+    return server
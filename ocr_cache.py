@@ -0,0 +1,103 @@
+"""
+车牌 OCR 结果缓存。
+
+同一块车牌在相邻几帧里的二值化裁剪图几乎相同 (例如停在车道上的车)，
+用 dHash 感知哈希加车牌位置作为键，在 TTL 内命中时直接复用上次的
+OCR 结果，不再运行识别模型。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+import metrics
+
+
+def dhash(image, hash_size: int = 8) -> int:
+    """
+    差值哈希: 缩小到 (hash_size + 1) x hash_size 的灰度图，比较水平相邻像素，
+    得到 hash_size * hash_size 位整数。对轻微的亮度变化和缩放不敏感。
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class PlateOcrCache:
+    """
+    按 (dHash, 车牌位置) 缓存 OCR 结果，LRU 淘汰，条目在 ttl 秒后过期。
+
+    查找时要求哈希的汉明距离不超过 max_hamming，且车牌中心的偏移不超过
+    position_tolerance 倍车牌宽度。无法识别的结果 (text 为 None) 也会缓存。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: float = 5.0,
+        max_hamming: int = 4,
+        position_tolerance: float = 0.25,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_hamming = max_hamming
+        self.position_tolerance = position_tolerance
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # id -> (hash, cx, cy, width, result, stored_at)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _box_center(bbox):
+        x1, y1, x2, y2 = bbox[:4]
+        return (x1 + x2) / 2.0, (y1 + y2) / 2.0, max(x2 - x1, 1.0)
+
+    def lookup(self, image_hash: int, bbox, now: float = None):
+        """返回缓存的 (text, score)，未命中返回 None。"""
+        now = time.monotonic() if now is None else now
+        cx, cy, width = self._box_center(bbox)
+        with self._lock:
+            found = None
+            for entry_id, (cached_hash, ex, ey, ewidth, result, stored_at) in list(
+                self._entries.items()
+            ):
+                if now - stored_at > self.ttl:
+                    del self._entries[entry_id]
+                    continue
+                if found is not None:
+                    continue
+                tolerance = self.position_tolerance * max(width, ewidth)
+                if (
+                    abs(cx - ex) <= tolerance
+                    and abs(cy - ey) <= tolerance
+                    and (image_hash ^ cached_hash).bit_count() <= self.max_hamming
+                ):
+                    found = entry_id
+            if found is None:
+                self.misses += 1
+                result = None
+            else:
+                self._entries.move_to_end(found)
+                self.hits += 1
+                result = self._entries[found][4]
+        metrics.increment("ocr_cache_misses" if result is None else "ocr_cache_hits")
+        return result
+
+    def store(self, image_hash: int, bbox, result, now: float = None):
+        now = time.monotonic() if now is None else now
+        cx, cy, width = self._box_center(bbox)
+        with self._lock:
+            self._entries[self._next_id] = (image_hash, cx, cy, width, result, now)
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
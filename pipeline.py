@@ -0,0 +1,131 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import metrics
+
+
+@dataclass
+class LprJob:
+    """一帧在流水线各阶段之间传递的数据。"""
+
+    frame: object
+    capture_time_str: str
+    capture_monotonic: float
+    output_crop_dir: str
+    output_crop_thresh_dir: str
+    # 检测阶段通过它回报车辆数量，驱动 burst 模式
+    scheduler: object = None
+    # 车辆跟踪器，为车牌关联 track 并融合多次识别结果
+    tracker: object = None
+    # 车牌 OCR 结果缓存 (见 ocr_cache.py)，相同的车牌裁剪图不重复识别
+    ocr_cache: object = None
+    # 多摄像头模式下的摄像头名称 (单摄像头时为空) 与画面旋转参数
+    camera_name: str = ""
+    rotate_code: object = None
+    # 感兴趣区域 (见 cameras.parse_roi)，在旋转之前从源画面裁剪，None 表示整幅画面
+    roi: tuple = None
+    # 每个车牌一个 dict: bbox, frame_bbox, bbox_score, crop_thresh, text, text_score, ocr_cached, matched
+    plates: list = field(default_factory=list)
+
+
+@dataclass
+class PipelineStage:
+    """
+    流水线中的一个阶段。
+
+    fn 接收上一阶段的输出，返回交给下一阶段的对象；返回 None 表示在此阶段
+    结束 (例如没有检测到车牌)。blocking=True 的阶段在线程池中执行，
+    其余阶段必须是协程函数，直接在事件循环中 await。
+    """
+
+    name: str
+    fn: object
+    blocking: bool = False
+
+
+class LprPipeline:
+    """
+    capture → detect → OCR → match → actuate 的分阶段异步流水线。
+
+    相邻阶段之间用有界 asyncio.Queue 连接，每个阶段一个消费协程，
+    因此第 N+1 帧的检测可以与第 N 帧的 OCR 和开门动作重叠执行。
+    入口队列满时丢弃最旧的帧 (只处理最新画面)，后续队列满时向上游施加背压。
+    """
+
+    def __init__(self, stages, queue_size=1, max_workers=None, on_error=None):
+        self.stages = list(stages)
+        if max_workers is None:
+            # 每个阻塞阶段一个线程，各阶段可以同时运行
+            max_workers = max(1, sum(1 for stage in self.stages if stage.blocking))
+        self.queue_size = queue_size
+        self.on_error = on_error
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="lpr-stage"
+        )
+        self._queues = []
+        self._tasks = []
+
+    def start(self):
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        for index, stage in enumerate(self.stages):
+            self._tasks.append(
+                asyncio.create_task(
+                    self._run_stage(index, stage), name=f"lpr-{stage.name}"
+                )
+            )
+        return self
+
+    def submit(self, item) -> bool:
+        """
+        把一帧放入第一个阶段的队列，从不阻塞。
+        队列已满时替换掉尚未处理的旧帧，返回 False 表示有旧帧被丢弃。
+        """
+        queue = self._queues[0]
+        dropped = False
+        while queue.full():
+            queue.get_nowait()
+            queue.task_done()
+            dropped = True
+        queue.put_nowait(item)
+        return not dropped
+
+    async def _run_stage(self, index, stage):
+        loop = asyncio.get_running_loop()
+        in_queue = self._queues[index]
+        out_queue = (
+            self._queues[index + 1] if index + 1 < len(self._queues) else None
+        )
+        while True:
+            item = await in_queue.get()
+            started = time.perf_counter()
+            try:
+                if stage.blocking:
+                    result = await loop.run_in_executor(self._executor, stage.fn, item)
+                else:
+                    result = await stage.fn(item)
+                if result is not None and out_queue is not None:
+                    await out_queue.put(result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(stage.name, item, e)
+                else:
+                    print(f"流水线阶段 '{stage.name}' 出错: {e}")
+            finally:
+                metrics.observe(f"pipeline_{stage.name}", time.perf_counter() - started)
+                in_queue.task_done()
+
+    async def join(self):
+        """等待所有已提交的帧流经整个流水线。"""
+        for queue in self._queues:
+            await queue.join()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown(wait=False, cancel_futures=True)
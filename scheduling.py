@@ -0,0 +1,216 @@
+import math
+
+import cv2
+
+
+class MotionGate:
+    """
+    廉价的运动检测门控。
+
+    把帧缩小到 downscale_width 宽的灰度图，与滑动平均背景做差分，
+    变化像素占比超过 min_area_ratio 即认为有运动。整个过程在小图上进行，
+    开销远小于一次 YOLO 推理。
+    """
+
+    def __init__(
+        self,
+        downscale_width: int = 160,
+        pixel_threshold: int = 25,
+        min_area_ratio: float = 0.005,
+        background_alpha: float = 0.05,
+    ):
+        self.downscale_width = downscale_width
+        self.pixel_threshold = pixel_threshold
+        self.min_area_ratio = min_area_ratio
+        self.background_alpha = background_alpha
+        self.last_motion_ratio = 0.0
+        self._background = None
+
+    def reset(self):
+        self._background = None
+        self.last_motion_ratio = 0.0
+
+    def update(self, frame) -> bool:
+        """用新帧更新背景模型，返回该帧相对背景是否有运动。"""
+        height, width = frame.shape[:2]
+        scale = self.downscale_width / float(width)
+        small = cv2.resize(
+            frame,
+            (self.downscale_width, max(1, int(height * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype("float32")
+            self.last_motion_ratio = 0.0
+            return False
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        self.last_motion_ratio = cv2.countNonZero(mask) / float(mask.size)
+        cv2.accumulateWeighted(gray, self._background, self.background_alpha)
+        return self.last_motion_ratio >= self.min_area_ratio
+
+
+def rect_imgsz(height: int, width: int, imgsz: int, stride: int = 32):
+    """
+    矩形推理的输入尺寸 (高, 宽): 长边缩放到 imgsz，短边按比例缩放后向上取整到 stride 的倍数。
+    竖屏 (旋转后) 画面不再被填充成 imgsz x imgsz 的正方形。
+    """
+    scale = imgsz / float(max(height, width, 1))
+    return (
+        max(stride, math.ceil(height * scale / stride) * stride),
+        max(stride, math.ceil(width * scale / stride) * stride),
+    )
+
+
+class InferenceResolutionScheduler:
+    """
+    按上一次检测结果选择 YOLO 输入尺寸。
+
+    没有车辆或车辆还很远时，车辆检测只需判断"有没有车"，使用较小的 presence_imgsz；
+    上一次检测到的最大车辆框面积占画面比例达到 near_area_ratio (车辆近到可以读车牌) 时，
+    改用 near_imgsz。车牌检测器使用固定的 plate_imgsz。
+    vehicle_rect / plate_rect 为 True 时按画面长宽比做矩形推理。
+    """
+
+    def __init__(
+        self,
+        presence_imgsz: int = 320,
+        near_imgsz: int = 640,
+        plate_imgsz: int = 640,
+        near_area_ratio: float = 0.03,
+        vehicle_rect: bool = True,
+        plate_rect: bool = True,
+    ):
+        self.presence_imgsz = presence_imgsz
+        self.near_imgsz = near_imgsz
+        self.plate_imgsz = plate_imgsz
+        self.near_area_ratio = near_area_ratio
+        self.vehicle_rect = vehicle_rect
+        self.plate_rect = plate_rect
+        self.last_area_ratio = 0.0
+
+    @property
+    def near(self) -> bool:
+        return self.last_area_ratio >= self.near_area_ratio
+
+    def reset(self):
+        self.last_area_ratio = 0.0
+
+    def vehicle_args(self, near: bool = None) -> dict:
+        """车辆检测的推理参数，near 为 None 时按上一次检测结果选择。"""
+        near = self.near if near is None else near
+        return {
+            "imgsz": self.near_imgsz if near else self.presence_imgsz,
+            "rect": self.vehicle_rect,
+        }
+
+    def plate_args(self) -> dict:
+        return {"imgsz": self.plate_imgsz, "rect": self.plate_rect}
+
+    def report_vehicle_boxes(self, boxes, frame_width: int, frame_height: int):
+        """检测阶段回报车辆框 ([x1, y1, x2, y2, ...])，决定下一帧的输入尺寸。"""
+        frame_area = float(max(frame_width * frame_height, 1))
+        was_near = self.near
+        self.last_area_ratio = max(
+            ((x2 - x1) * (y2 - y1) / frame_area for x1, y1, x2, y2, *_ in boxes),
+            default=0.0,
+        )
+        if self.near != was_near and self.presence_imgsz != self.near_imgsz:
+            imgsz = self.near_imgsz if self.near else self.presence_imgsz
+            print(f"车辆框面积占比 {self.last_area_ratio:.1%}，车辆检测输入尺寸切换为 {imgsz}。")
+
+
+class LprScheduler:
+    """
+    自适应的 LPR 调度器，取代固定的处理间隔。
+
+    - idle: 每 motion_check_interval 秒用 MotionGate 检查一次，有运动立即处理；
+      即使没有运动，每 idle_interval 秒也会兜底处理一帧。
+    - burst: 检测到车辆后进入，每 burst_interval 秒处理一帧，
+      最后一次看到车辆 burst_duration 秒后回到 idle。
+    """
+
+    IDLE = "idle"
+    BURST = "burst"
+
+    def __init__(
+        self,
+        idle_interval: float = 10.0,
+        burst_interval: float = 1.0,
+        burst_duration: float = 8.0,
+        motion_gate: MotionGate = None,
+        motion_check_interval: float = 0.5,
+        resolution: InferenceResolutionScheduler = None,
+    ):
+        self.idle_interval = idle_interval
+        self.burst_interval = burst_interval
+        self.burst_duration = burst_duration
+        self.motion_gate = motion_gate
+        self.motion_check_interval = motion_check_interval
+        # 检测阶段通过它选择 YOLO 输入尺寸，None 表示使用模型默认设置
+        self.resolution = resolution
+        self.mode = self.IDLE
+        self._burst_until = 0.0
+        self._last_processed = 0.0
+
+    def reset(self, now: float):
+        """流重连后调用：回到 idle 并重置背景模型。"""
+        self.mode = self.IDLE
+        self._burst_until = 0.0
+        self._last_processed = now
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        if self.resolution is not None:
+            self.resolution.reset()
+
+    def _refresh_mode(self, now: float):
+        if self.mode == self.BURST and now >= self._burst_until:
+            print("未再检测到车辆，LPR 调度回到 idle 模式。")
+            self.mode = self.IDLE
+
+    def next_check_delay(self, now: float) -> float:
+        """距离下一次需要取帧检查的秒数。"""
+        self._refresh_mode(now)
+        since_processed = now - self._last_processed
+        if self.mode == self.BURST:
+            return max(0.0, self.burst_interval - since_processed)
+        delay = self.idle_interval - since_processed
+        if self.motion_gate is not None:
+            delay = min(delay, self.motion_check_interval)
+        return max(0.0, delay)
+
+    def should_process(self, frame, now: float):
+        """
+        判断这一帧是否需要跑检测器，返回 (bool, 原因)。
+        每次调用都会把帧送入 MotionGate 更新背景，运动触发的处理
+        不会比 burst_interval 更频繁。
+        """
+        self._refresh_mode(now)
+        since_processed = now - self._last_processed
+        motion = self.motion_gate is not None and self.motion_gate.update(frame)
+        if self.mode == self.BURST:
+            return since_processed >= self.burst_interval, "burst"
+        if motion and since_processed >= self.burst_interval:
+            return True, "motion"
+        if since_processed >= self.idle_interval:
+            return True, "idle"
+        return False, None
+
+    def mark_processed(self, now: float):
+        self._last_processed = now
+
+    def report_vehicles(self, vehicle_count: int, now: float):
+        """
+        检测阶段回报还需要识别车牌的车辆数量 (车牌已确认的车辆不计入)；
+        数量大于 0 时进入 (或延长) burst 模式。
+        """
+        if vehicle_count <= 0:
+            return
+        if self.mode != self.BURST:
+            print(f"检测到 {vehicle_count} 辆车，LPR 调度进入 burst 模式。")
+        self.mode = self.BURST
+        self._burst_until = now + self.burst_duration
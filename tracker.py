@@ -0,0 +1,198 @@
+import itertools
+import threading
+
+import numpy as np
+
+from util import box_iou
+
+
+class _KalmanBoxFilter:
+    """
+    恒速模型的卡尔曼滤波器，状态为 [cx, cy, w, h, vx, vy]。
+    帧间隔不固定 (idle/burst)，因此 predict() 接收实际的时间差 dt。
+    """
+
+    def __init__(self, box):
+        cx, cy, w, h = self._to_measurement(box)
+        self.x = np.array([cx, cy, w, h, 0.0, 0.0])
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1000.0, 1000.0])
+        self.H = np.hstack([np.eye(4), np.zeros((4, 2))])
+        self.R = np.diag([1.0, 1.0, 10.0, 10.0])
+
+    @staticmethod
+    def _to_measurement(box):
+        x1, y1, x2, y2 = box[:4]
+        return (x1 + x2) / 2.0, (y1 + y2) / 2.0, x2 - x1, y2 - y1
+
+    def predict(self, dt: float):
+        F = np.eye(6)
+        F[0, 4] = dt
+        F[1, 5] = dt
+        Q = np.diag([1.0, 1.0, 1.0, 1.0, 10.0, 10.0]) * max(dt, 1e-3)
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + Q
+
+    def update(self, box):
+        z = np.array(self._to_measurement(box))
+        y = z - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(6) - K @ self.H) @ self.P
+
+    def box(self):
+        cx, cy, w, h = self.x[:4]
+        w = max(w, 1.0)
+        h = max(h, 1.0)
+        return [cx - w / 2.0, cy - h / 2.0, cx + w / 2.0, cy + h / 2.0]
+
+
+class Track:
+    """一辆被跟踪的车辆，以及附着在它上面的车牌识别结果。"""
+
+    def __init__(self, track_id: int, box, now: float):
+        self.track_id = track_id
+        self.box = list(box[:4])
+        self.score = float(box[4]) if len(box) > 4 else None
+        self.hits = 1
+        self.last_seen = now
+        self._filter = _KalmanBoxFilter(box)
+        # 滤波器状态对应的时刻: 漏检时 predict() 也会推进状态，不能再从 last_seen 重复外推
+        self._predicted_at = now
+        self._lock = threading.Lock()
+        # 车牌文字 -> (置信度加权的票数, 读到的次数)
+        self._plate_votes = {}
+        self.confirmed_plate = None
+
+    def predict(self, now: float):
+        self._filter.predict(now - self._predicted_at)
+        self._predicted_at = now
+        return self._filter.box()
+
+    def update(self, box, now: float):
+        self._filter.update(box)
+        self.box = list(box[:4])
+        self.score = float(box[4]) if len(box) > 4 else None
+        self.hits += 1
+        self.last_seen = now
+        self._predicted_at = now
+
+    def add_plate_read(
+        self, text: str, score, confirm_reads: int = 2, confirm_ratio: float = 0.6
+    ):
+        """
+        记录一次 OCR 结果并做置信度加权投票。
+        得票最多的文字读到至少 confirm_reads 次且占总权重的 confirm_ratio 以上时确认车牌。
+        返回 (融合后的文字, 该文字的权重占比)。
+        """
+        weight = float(score) if score is not None else 0.5
+        with self._lock:
+            votes, count = self._plate_votes.get(text, (0.0, 0))
+            self._plate_votes[text] = (votes + weight, count + 1)
+            best_text, (best_votes, best_count) = max(
+                self._plate_votes.items(), key=lambda item: item[1][0]
+            )
+            total_votes = sum(votes for votes, _ in self._plate_votes.values())
+            share = best_votes / total_votes if total_votes > 0 else 0.0
+            if (
+                self.confirmed_plate is None
+                and best_count >= confirm_reads
+                and share >= confirm_ratio
+            ):
+                self.confirmed_plate = best_text
+                print(f"车辆 #{self.track_id} 车牌已确认: {best_text} ({share:.2f})")
+            return best_text, share
+
+    def fused_plate(self):
+        """不投票，返回当前的 (融合后的文字, 权重占比)；还没有识别结果时返回 (None, 0.0)。"""
+        with self._lock:
+            if not self._plate_votes:
+                return None, 0.0
+            best_text, (best_votes, _) = max(
+                self._plate_votes.items(), key=lambda item: item[1][0]
+            )
+            total_votes = sum(votes for votes, _ in self._plate_votes.values())
+            return best_text, best_votes / total_votes if total_votes > 0 else 0.0
+
+    @property
+    def needs_ocr(self) -> bool:
+        return self.confirmed_plate is None
+
+
+class VehicleTracker:
+    """
+    轻量的 IoU + 卡尔曼车辆跟踪器，为车辆框分配稳定的 track ID。
+
+    每次 update() 先用卡尔曼滤波预测已有轨迹的位置，再按 IoU 从大到小贪心匹配
+    新的检测框；未匹配的检测框新建轨迹，超过 max_age 秒没有再出现的轨迹被删除。
+    """
+
+    def __init__(
+        self,
+        iou_threshold: float = 0.3,
+        max_age: float = 30.0,
+        confirm_reads: int = 2,
+        confirm_ratio: float = 0.6,
+    ):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.confirm_reads = confirm_reads
+        self.confirm_ratio = confirm_ratio
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def reset(self):
+        self.tracks = []
+
+    def update(self, boxes, now: float):
+        """
+        用这一帧的车辆框 (N x 5: x1, y1, x2, y2, score) 更新轨迹。
+        返回与 boxes 一一对应的 Track 列表。
+        """
+        self.tracks = [
+            track for track in self.tracks if now - track.last_seen <= self.max_age
+        ]
+        predicted = [track.predict(now) for track in self.tracks]
+
+        pairs = []
+        for det_index, box in enumerate(boxes):
+            for track_index, predicted_box in enumerate(predicted):
+                iou = box_iou(box[:4], predicted_box)
+                if iou >= self.iou_threshold:
+                    pairs.append((iou, det_index, track_index))
+        pairs.sort(reverse=True)
+
+        assigned = [None] * len(boxes)
+        used_tracks = set()
+        for _, det_index, track_index in pairs:
+            if assigned[det_index] is not None or track_index in used_tracks:
+                continue
+            track = self.tracks[track_index]
+            track.update(boxes[det_index], now)
+            assigned[det_index] = track
+            used_tracks.add(track_index)
+
+        for det_index, box in enumerate(boxes):
+            if assigned[det_index] is None:
+                track = Track(next(self._ids), box, now)
+                self.tracks.append(track)
+                assigned[det_index] = track
+        return assigned
+
+    def add_plate_read(self, track: Track, text: str, score):
+        return track.add_plate_read(
+            text, score, self.confirm_reads, self.confirm_ratio
+        )
+
+    @staticmethod
+    def track_for_box(tracks_by_box, plate_box):
+        """返回包含车牌中心点的车辆轨迹 (tracks_by_box 为 [(vehicle_box, track)])。"""
+        center_x = (plate_box[0] + plate_box[2]) / 2.0
+        center_y = (plate_box[1] + plate_box[3]) / 2.0
+        for vehicle_box, track in tracks_by_box:
+            if (
+                vehicle_box[0] <= center_x <= vehicle_box[2]
+                and vehicle_box[1] <= center_y <= vehicle_box[3]
+            ):
+                return track
+        return None
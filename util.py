@@ -1,15 +1,39 @@
 import string
-from fast_plate_ocr import LicensePlateRecognizer
 import os
-import csv
+import threading
+import cv2
+import numpy as np
+
+import metrics
+from log_sink import get_log_sink
 
 # Note: scapy and socket were previously imported but unused; removed to satisfy linter
 
-# Initialize the Fast Plate OCR recognizer
+# The Fast Plate OCR recognizer is created lazily by get_recognizer(), so importing
+# this module for the similarity or logging helpers does not load the OCR model.
 # Model can be configured via FAST_PLATE_OCR_MODEL env var
 # Example models: "cct-xs-v1-global-model", "global-plates-mobile-vit-v2-model"
 _FPOCR_MODEL_NAME = os.getenv("FAST_PLATE_OCR_MODEL", "cct-xs-v1-global-model")
-recognizer = LicensePlateRecognizer(_FPOCR_MODEL_NAME)
+_recognizer = None
+_recognizer_lock = threading.Lock()
+
+
+def get_recognizer():
+    """
+    Return the shared Fast Plate OCR recognizer, loading it on first use.
+
+    Returns:
+        LicensePlateRecognizer: The recognizer instance.
+    """
+    global _recognizer
+    if _recognizer is None:
+        with _recognizer_lock:
+            if _recognizer is None:
+                from fast_plate_ocr import LicensePlateRecognizer
+
+                _recognizer = LicensePlateRecognizer(_FPOCR_MODEL_NAME)
+    return _recognizer
+
 
 special_characters = [
     "-",
@@ -108,30 +132,32 @@ def write_csv(results, output_path):
 
 
 def write_log_entry(data_row, csv_header, log_file="log.csv"):
-    """将一行数据写入到 CSV 日志文件"""
-    file_exists = os.path.isfile(log_file)
-    try:
-        with open(log_file, mode="a", newline="", encoding="utf-8") as csv_file:
-            writer = csv.writer(csv_file)
-            if (
-                not file_exists or os.path.getsize(log_file) == 0
-            ):  # 如果文件不存在或是空的
-                writer.writerow(csv_header)  # 写入表头
-                print(f"CSV 日志文件 '{log_file}' 已创建并写入表头。")
-            writer.writerow(data_row)
-    except Exception as e:
-        print(f"写入日志到 '{log_file}' 时发生错误: {e}")
+    """将一行数据写入到 CSV 日志文件 (由后台线程批量写入，不阻塞调用方)"""
+    get_log_sink().write_row(log_file, data_row, csv_header)
+
 
 def write_log_to_txt(text, log_file="log.txt"):
-    """将一行数据写入到 TXT 日志文件"""
-    try:
-        with open(log_file, "a", encoding="utf-8") as f:
-            line = str(text)
-            if not line.endswith("\n"):
-                line += "\n"
-            f.write(line)
-    except Exception as e:
-        print(f"写入日志到 '{log_file}' 时发生错误: {e}")
+    """将一行数据写入到 TXT 日志文件 (由后台线程批量写入，不阻塞调用方)"""
+    get_log_sink().write_line(log_file, text)
+
+
+def box_iou(box_a, box_b):
+    """
+    Compute the intersection-over-union of two [x1, y1, x2, y2] boxes.
+
+    Returns:
+        float: IoU in the range 0.0 to 1.0.
+    """
+    inter_x1 = max(box_a[0], box_b[0])
+    inter_y1 = max(box_a[1], box_b[1])
+    inter_x2 = min(box_a[2], box_b[2])
+    inter_y2 = min(box_a[3], box_b[3])
+    inter_area = max(0.0, inter_x2 - inter_x1) * max(0.0, inter_y2 - inter_y1)
+    if inter_area <= 0:
+        return 0.0
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+    return inter_area / float(area_a + area_b - inter_area)
 
 
 def license_complies_format(text):
@@ -363,72 +389,145 @@ def format_license(text):
 #     return results
 
 
-def read_license_plate(license_plate_crop, remove_special_characters=True):
+def normalize_plate_text(text, remove_special_characters=True):
     """
-    Read the license plate text from the given cropped image.
+    Normalize raw OCR (or user supplied) license plate text.
 
     Args:
-        license_plate_crop (PIL.Image.Image): Cropped image containing the license plate.
+        text: Raw license plate text.
+        remove_special_characters (bool): Strip separators, padding and punctuation.
 
     Returns:
-        tuple: Tuple containing the formatted license plate text and its confidence score.
+        str: Normalized license plate text.
     """
-    # Fast Plate OCR expects an image path or ndarray depending on version.
-    # To be version-agnostic, save the crop to a temporary file and run OCR on it.
-    try:
-        import tempfile
-        import cv2
-
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=True) as tmp:
-            # Ensure we can write regardless of grayscale or color input
-            cv2.imwrite(tmp.name, license_plate_crop)  # pylint: disable=no-member
-            result = recognizer.run(tmp.name)
-
-        # Parse result into (text, score)
-        text = None
-        score = None
-
-        # Handle simple array format like ['1WT1PP___']
-        if isinstance(result, (list, tuple)) and len(result) > 0:
-            first = result[0]
-            if isinstance(first, str):
-                # Simple string array format
-                text = first
-                score = None  # No score provided in this format
-            elif isinstance(first, dict):
-                text = (
-                    first.get("text")
-                    or first.get("plate")
-                    or first.get("license_plate")
-                )
-                score = (
-                    first.get("score") or first.get("confidence") or first.get("prob")
-                )
-            elif isinstance(first, (list, tuple)):
-                # Try tuple formats like (text, score) or (bbox, text, score)
-                if len(first) >= 2 and isinstance(first[0], str):
-                    text = first[0]
-                    score = first[1] if len(first) > 1 else None
-                elif len(first) >= 3 and isinstance(first[1], str):
-                    text = first[1]
-                    score = first[2]
-        elif isinstance(result, dict):
-            text = (
-                result.get("text") or result.get("plate") or result.get("license_plate")
-            )
-            score = (
-                result.get("score") or result.get("confidence") or result.get("prob")
-            )
+    if remove_special_characters:
+        return "".join(char for char in str(text) if (char not in special_characters))
+    return str(text)
+
+
+def _parse_recognizer_item(item):
+    """Extract (text, score) from a single recognizer output item of any known format."""
+    text = None
+    score = None
+    if isinstance(item, str):
+        # Simple string format like '1WT1PP___', no score provided
+        text = item
+    elif isinstance(item, dict):
+        text = item.get("text") or item.get("plate") or item.get("license_plate")
+        score = item.get("score") or item.get("confidence") or item.get("prob")
+    elif isinstance(item, (list, tuple)):
+        # Try tuple formats like (text, score) or (bbox, text, score)
+        if len(item) >= 2 and isinstance(item[0], str):
+            text = item[0]
+            score = item[1]
+        elif len(item) >= 3 and isinstance(item[1], str):
+            text = item[1]
+            score = item[2]
+    return text, score
+
+
+def _to_model_color_mode(crop, color_mode):
+    """
+    Convert a crop to the channel layout the recognizer model expects.
 
-        if text is None:
-            return None, None
+    fast_plate_ocr only adds the channel axis for grayscale models, so RGB models
+    need 3-channel input. 2-D crops (the thresholded plates) are expanded to RGB and
+    3-channel crops are assumed to be BGR as produced by OpenCV.
+
+    Args:
+        crop (numpy.ndarray): Grayscale (H, W) or BGR (H, W, 3) crop.
+        color_mode (str): The model's ``image_color_mode`` ("grayscale" or "rgb").
+
+    Returns:
+        numpy.ndarray: The crop in the model's colour mode.
+    """
+    if color_mode == "rgb":
+        if crop.ndim == 2:
+            return cv2.cvtColor(crop, cv2.COLOR_GRAY2RGB)
+        return cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+    if crop.ndim == 3:
+        return cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    return crop
+
+
+def _run_recognizer_batch(crops):
+    """
+    Run the recognizer once on a list of in-memory crops.
+
+    Returns:
+        list: One (text, score) tuple per crop, text/score may be None.
+    """
+    recognizer = get_recognizer()
+    config = getattr(recognizer, "config", None)
+    color_mode = getattr(config, "image_color_mode", "grayscale")
+    crops = [_to_model_color_mode(crop, color_mode) for crop in crops]
+    with metrics.observe_latency("ocr"):
+        try:
+            result = recognizer.run(crops, return_confidence=True)
+        except TypeError:
+            # Older fast_plate_ocr versions without return_confidence
+            result = recognizer.run(crops)
 
-        # Normalize text
-        normalized_text = (
-            "".join(char for char in str(text) if (char not in special_characters))
-            if remove_special_characters
-            else str(text)
+    # (plates, per-character probabilities) as returned with return_confidence=True
+    if (
+        isinstance(result, tuple)
+        and len(result) == 2
+        and isinstance(result[0], (list, tuple))
+        and len(result[0]) == len(crops)
+    ):
+        plates, probs = result
+        parsed = []
+        for plate, char_probs in zip(plates, probs):
+            # Average confidence over real characters, ignoring padding slots
+            kept = [
+                float(prob)
+                for char, prob in zip(plate, char_probs)
+                if char not in special_characters
+            ]
+            parsed.append((plate, sum(kept) / len(kept) if kept else None))
+        return parsed
+
+    if isinstance(result, dict):
+        result = [result]
+    if isinstance(result, (list, tuple)) and len(result) == len(crops):
+        return [_parse_recognizer_item(item) for item in result]
+    return [(None, None)] * len(crops)
+
+
+def read_license_plates(license_plate_crops, remove_special_characters=True):
+    """
+    Read the license plate text of several cropped images in one recognizer call.
+
+    The crops are passed to the recognizer as in-memory NumPy arrays, nothing is
+    written to disk.
+
+    Args:
+        license_plate_crops (list[numpy.ndarray]): Cropped images containing license plates.
+        remove_special_characters (bool): Strip separators and padding from the text.
+
+    Returns:
+        list: One (text, score) tuple per crop, (None, None) where nothing was read.
+    """
+    results = [(None, None)] * len(license_plate_crops)
+    valid_indices = [
+        index
+        for index, crop in enumerate(license_plate_crops)
+        if crop is not None and getattr(crop, "size", 0) > 0
+    ]
+    if not valid_indices:
+        return results
+
+    try:
+        parsed = _run_recognizer_batch(
+            [license_plate_crops[index] for index in valid_indices]
         )
+    except Exception as e:
+        print(f"Fast Plate OCR error: {e}")
+        return results
+
+    for index, (text, score) in zip(valid_indices, parsed):
+        if text is None:
+            continue
 
         # Normalize score to float if possible
         try:
@@ -436,10 +535,24 @@ def read_license_plate(license_plate_crop, remove_special_characters=True):
         except Exception:
             score_val = None
 
-        return normalized_text, score_val
-    except Exception as e:
-        print(f"Fast Plate OCR error: {e}")
-        return None, None
+        results[index] = (
+            normalize_plate_text(text, remove_special_characters),
+            score_val,
+        )
+    return results
+
+
+def read_license_plate(license_plate_crop, remove_special_characters=True):
+    """
+    Read the license plate text from the given cropped image.
+
+    Args:
+        license_plate_crop (numpy.ndarray): Cropped image containing the license plate.
+
+    Returns:
+        tuple: Tuple containing the formatted license plate text and its confidence score.
+    """
+    return read_license_plates([license_plate_crop], remove_special_characters)[0]
 
 
 # --- Custom String Similarity Functions ---
@@ -466,6 +579,12 @@ CONFUSABLE_SUBSTITUTION_COST = (
     0.3  # Cost for substituting confusable characters (0 < cost < 1)
 )
 
+# Both orderings of every confusable pair, so the DP inner loop is a single dict lookup
+_CONFUSABLE_COSTS = {}
+for _char_a, _char_b in CONFUSABLE_PAIRS:
+    _CONFUSABLE_COSTS[(_char_a, _char_b)] = CONFUSABLE_SUBSTITUTION_COST
+    _CONFUSABLE_COSTS[(_char_b, _char_a)] = CONFUSABLE_SUBSTITUTION_COST
+
 
 def _calculate_custom_levenshtein_distance(s1: str, s2: str) -> float:
     """
@@ -494,8 +613,8 @@ def _calculate_custom_levenshtein_distance(s1: str, s2: str) -> float:
             substitution_cost = 1.0
             if char_s1 == char_s2:
                 substitution_cost = 0.0
-            elif tuple(sorted((char_s1, char_s2))) in CONFUSABLE_PAIRS:
-                substitution_cost = CONFUSABLE_SUBSTITUTION_COST
+            else:
+                substitution_cost = _CONFUSABLE_COSTS.get((char_s1, char_s2), 1.0)
 
             substitutions = previous_row[j] + substitution_cost
             current_row.append(min(insertions, deletions, substitutions))
@@ -504,6 +623,51 @@ def _calculate_custom_levenshtein_distance(s1: str, s2: str) -> float:
     return float(previous_row[-1])
 
 
+def _bounded_custom_levenshtein_distance(
+    s1: str, s2: str, max_distance: float
+) -> float:
+    """
+    Same metric as _calculate_custom_levenshtein_distance() for already upper-cased
+    strings, but gives up as soon as the distance is known to exceed max_distance.
+
+    Returns:
+        float: The exact distance if it is <= max_distance, otherwise float("inf").
+    """
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+
+    if len(s1) - len(s2) > max_distance:
+        return float("inf")
+    if len(s2) == 0:
+        return float(len(s1))
+
+    previous_row = list(range(len(s2) + 1))
+
+    for i, char_s1 in enumerate(s1):
+        current_row = [float(i + 1)]
+        row_min = current_row[0]
+        for j, char_s2 in enumerate(s2):
+            insertions = previous_row[j + 1] + 1.0
+            deletions = current_row[j] + 1.0
+            if char_s1 == char_s2:
+                substitutions = previous_row[j] + 0.0
+            else:
+                substitutions = previous_row[j] + _CONFUSABLE_COSTS.get(
+                    (char_s1, char_s2), 1.0
+                )
+            value = min(insertions, deletions, substitutions)
+            current_row.append(value)
+            if value < row_min:
+                row_min = value
+        # Row minima never decrease, so the final distance is at least row_min
+        if row_min > max_distance:
+            return float("inf")
+        previous_row = current_row
+
+    distance = float(previous_row[-1])
+    return distance if distance <= max_distance else float("inf")
+
+
 def calculate_similarity_score(s1: str, s2: str) -> float:
     """
     Calculates a similarity score (0.0 to 1.0) between two strings
@@ -528,8 +692,315 @@ def calculate_similarity_score(s1: str, s2: str) -> float:
     return max(0.0, similarity)  # Ensure similarity is not negative
 
 
+class PlateWhitelistIndex:
+    """
+    Prebuilt index over a license plate whitelist for fast fuzzy matching.
+
+    Every operation of the weighted confusable-character Levenshtein distance
+    costs either CONFUSABLE_SUBSTITUTION_COST or 1.0, so a distance <= r allows at
+    most floor(r) "hard" edits once confusable characters are folded into one
+    class. By the pigeonhole principle one of floor(r) + 1 disjoint pieces of a
+    plate must then appear unchanged in the query. Plates are bucketed by length
+    and indexed by those pieces; a lookup only scores plates sharing a piece with
+    the query, using a distance computation that stops as soon as it exceeds the
+    threshold. Scores are identical to calculate_similarity_score().
+    """
+
+    # Slack for float rounding when comparing against the distance bound
+    _EPSILON = 1e-9
+
+    def __init__(self, plates):
+        self._plates = []
+        self._has_empty = False
+        # plate length -> list of (upper-cased plate, folded plate, original plate)
+        self._buckets = {}
+        # (plate length, allowed hard edits) -> (piece lengths, piece -> entries)
+        self._piece_indexes = {}
+        self._fold_table = self._build_fold_table()
+        for plate in plates:
+            self.add(plate)
+
+    def __len__(self) -> int:
+        return len(self._plates)
+
+    def __iter__(self):
+        return iter(self._plates)
+
+    @property
+    def plates(self) -> list[str]:
+        return list(self._plates)
+
+    @staticmethod
+    def _build_fold_table():
+        """Map every confusable character to one representative of its group."""
+        parent = {}
+
+        def find(char):
+            while parent.get(char, char) != char:
+                char = parent[char]
+            return char
+
+        for char_a, char_b in CONFUSABLE_PAIRS:
+            root_a, root_b = find(char_a), find(char_b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+        return str.maketrans({char: find(char) for char in parent})
+
+    def add(self, plate: str):
+        """Insert a single whitelist entry (non-strings are ignored)."""
+        if not isinstance(plate, str):
+            return
+        self._plates.append(plate)
+        if not plate:
+            self._has_empty = True
+            return
+        upper = plate.upper()
+        entry = (upper, upper.translate(self._fold_table), plate)
+        self._buckets.setdefault(len(plate), []).append(entry)
+        # Piece indexes for this length are rebuilt lazily on the next lookup
+        for key in [key for key in self._piece_indexes if key[0] == len(plate)]:
+            del self._piece_indexes[key]
+
+    def _piece_index(self, plate_len: int, hard_edits: int):
+        key = (plate_len, hard_edits)
+        index = self._piece_indexes.get(key)
+        if index is not None:
+            return index
+
+        piece_count = hard_edits + 1
+        bounds = [plate_len * i // piece_count for i in range(piece_count + 1)]
+        piece_lengths = {bounds[i + 1] - bounds[i] for i in range(piece_count)}
+        pieces = {}
+        for entry in self._buckets[plate_len]:
+            folded = entry[1]
+            for i in range(piece_count):
+                piece = folded[bounds[i] : bounds[i + 1]]
+                pieces.setdefault(piece, []).append(entry)
+        index = (sorted(piece_lengths), pieces)
+        self._piece_indexes[key] = index
+        return index
+
+    def _candidates(self, folded_query: str, plate_len: int, hard_edits: int):
+        if hard_edits + 1 > plate_len:
+            # Too many edits allowed for pieces to be non-empty, score the whole bucket
+            return self._buckets[plate_len]
+        piece_lengths, pieces = self._piece_index(plate_len, hard_edits)
+        seen = set()
+        candidates = []
+        for piece_len in piece_lengths:
+            for start in range(len(folded_query) - piece_len + 1):
+                for entry in pieces.get(folded_query[start : start + piece_len], ()):
+                    if id(entry) not in seen:
+                        seen.add(id(entry))
+                        candidates.append(entry)
+        return candidates
+
+    def best_match(self, text: str, confidence_percent: float):
+        """
+        Find the most similar whitelist entry at or above the confidence threshold.
+
+        Args:
+            text (str): The OCR text to look up.
+            confidence_percent (float): The similarity confidence threshold (0-100).
+
+        Returns:
+            tuple: (matched_plate, similarity) or (None, 0.0) if nothing is close enough.
+        """
+        if not isinstance(text, str):
+            return None, 0.0
+        threshold = confidence_percent / 100.0
+        if not text:
+            return ("", 1.0) if self._has_empty and threshold <= 1.0 else (None, 0.0)
+
+        query = text.upper()
+        folded_query = query.translate(self._fold_table)
+        query_len = len(text)
+        best_plate = None
+        best_score = 0.0
+
+        for plate_len in self._buckets:
+            max_len = float(max(query_len, plate_len))
+            max_distance = (1.0 - threshold) * max_len + self._EPSILON
+            if abs(query_len - plate_len) > max_distance:
+                continue
+
+            hard_edits = int(max_distance)
+            for upper, _, plate in self._candidates(folded_query, plate_len, hard_edits):
+                distance = _bounded_custom_levenshtein_distance(
+                    query, upper, max_distance
+                )
+                if distance == float("inf"):
+                    continue
+                similarity = max(0.0, 1.0 - (distance / max_len))
+                if similarity >= threshold and similarity > best_score:
+                    best_plate = plate
+                    best_score = similarity
+
+        return best_plate, best_score
+
+    def best_matches(self, candidates, confidence_percent: float):
+        """best_match() for each candidate, same interface as VectorizedPlateMatcher."""
+        return [self.best_match(text, confidence_percent) for text in candidates]
+
+
+class VectorizedPlateMatcher:
+    """
+    NumPy similarity engine scoring a block of candidate strings against the whole
+    whitelist in one pass.
+
+    The whitelist is encoded once into a padded code matrix and substitution costs
+    come from a table derived from CONFUSABLE_PAIRS and CONFUSABLE_SUBSTITUTION_COST.
+    The Levenshtein DP is run for all (candidate, whitelist) pairs at once, cell by
+    cell, with the same float operations as _calculate_custom_levenshtein_distance(),
+    so the scores match calculate_similarity_score() exactly.
+    """
+
+    def __init__(self, plates, block_size: int = 4096):
+        self._plates = [plate for plate in plates if isinstance(plate, str)]
+        self.block_size = block_size
+
+        upper_plates = [plate.upper() for plate in self._plates]
+        vocabulary = sorted(
+            {char for plate in upper_plates for char in plate}
+            | {char for pair in CONFUSABLE_PAIRS for char in pair}
+        )
+        self._codes = {char: code for code, char in enumerate(vocabulary)}
+        # Extra code for candidate characters that never appear in the whitelist
+        self._unknown_code = len(vocabulary)
+
+        cost_table = np.ones((len(vocabulary) + 1, len(vocabulary) + 1))
+        np.fill_diagonal(cost_table, 0.0)
+        cost_table[self._unknown_code, self._unknown_code] = 1.0
+        for (char_a, char_b), cost in _CONFUSABLE_COSTS.items():
+            cost_table[self._codes[char_a], self._codes[char_b]] = cost
+        self._cost_table = cost_table
+
+        self._plate_codes, self._plate_upper_lens = self._encode(upper_plates)
+        self._plate_lens = np.array([len(plate) for plate in self._plates], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._plates)
+
+    def __iter__(self):
+        return iter(self._plates)
+
+    @property
+    def plates(self) -> list[str]:
+        return list(self._plates)
+
+    def _encode(self, upper_strings):
+        width = max((len(text) for text in upper_strings), default=0)
+        codes = np.full((len(upper_strings), width), self._unknown_code, dtype=np.int64)
+        for row, text in enumerate(upper_strings):
+            codes[row, : len(text)] = [
+                self._codes.get(char, self._unknown_code) for char in text
+            ]
+        lengths = np.array([len(text) for text in upper_strings], dtype=np.int64)
+        return codes, lengths
+
+    def _distance_block(self, cand_codes, cand_lens, plate_codes, plate_lens):
+        """Custom Levenshtein distance for every candidate x plate pair, shape (C, W)."""
+        num_cands, cand_width = cand_codes.shape
+        num_plates, plate_width = plate_codes.shape
+        distances = np.empty((num_cands, num_plates))
+
+        # Row 0 of the DP table: distance from the empty prefix
+        previous_row = np.empty((num_cands, num_plates, plate_width + 1))
+        previous_row[:] = np.arange(plate_width + 1, dtype=np.float64)
+        plate_lens_index = np.broadcast_to(plate_lens, (num_cands, num_plates))[..., None]
+
+        empty = cand_lens == 0
+        if empty.any():
+            distances[empty] = plate_lens.astype(np.float64)
+
+        for i in range(cand_width):
+            # Substitution costs of candidate char i against every plate char
+            substitution = self._cost_table[cand_codes[:, i]][:, plate_codes]
+            current_row = np.empty_like(previous_row)
+            current_row[:, :, 0] = float(i + 1)
+            for j in range(plate_width):
+                current_row[:, :, j + 1] = np.minimum(
+                    np.minimum(previous_row[:, :, j + 1] + 1.0, current_row[:, :, j] + 1.0),
+                    previous_row[:, :, j] + substitution[:, :, j],
+                )
+            previous_row = current_row
+
+            finished = cand_lens == i + 1
+            if finished.any():
+                distances[finished] = np.take_along_axis(
+                    current_row[finished], plate_lens_index[finished], axis=2
+                )[..., 0]
+        return distances
+
+    def score_matrix(self, candidates):
+        """
+        Similarity scores (0.0 to 1.0) of every candidate against every whitelist entry.
+
+        Returns:
+            numpy.ndarray: Array of shape (len(candidates), len(whitelist)).
+        """
+        valid = np.array([isinstance(text, str) for text in candidates], dtype=bool)
+        texts = [text if isinstance(text, str) else "" for text in candidates]
+        cand_codes, cand_upper_lens = self._encode([text.upper() for text in texts])
+        cand_lens = np.array([len(text) for text in texts], dtype=np.int64)
+
+        scores = np.zeros((len(texts), len(self._plates)))
+        if not len(texts) or not len(self._plates):
+            return scores
+
+        for start in range(0, len(self._plates), self.block_size):
+            stop = start + self.block_size
+            plate_lens = self._plate_lens[start:stop]
+            distances = self._distance_block(
+                cand_codes,
+                cand_upper_lens,
+                self._plate_codes[start:stop],
+                self._plate_upper_lens[start:stop],
+            )
+            max_lens = np.maximum(cand_lens[:, None], plate_lens[None, :]).astype(
+                np.float64
+            )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                block = np.maximum(0.0, 1.0 - (distances / max_lens))
+            # Same special cases as calculate_similarity_score()
+            cand_empty = (cand_lens == 0)[:, None]
+            plate_empty = (plate_lens == 0)[None, :]
+            block = np.where(cand_empty | plate_empty, 0.0, block)
+            block = np.where(cand_empty & plate_empty, 1.0, block)
+            scores[:, start:stop] = block
+
+        scores[~valid] = 0.0
+        return scores
+
+    def best_matches(self, candidates, confidence_percent: float):
+        """
+        Best whitelist entry for each candidate.
+
+        Returns:
+            list: One (matched_plate, similarity) per candidate, (None, 0.0) where
+            no entry reaches the confidence threshold.
+        """
+        if not len(self._plates):
+            return [(None, 0.0)] * len(candidates)
+        scores = self.score_matrix(candidates)
+        best_indices = np.argmax(scores, axis=1)
+        threshold = confidence_percent / 100.0
+        matches = []
+        for row, best_index in enumerate(best_indices):
+            score = float(scores[row, best_index])
+            if score >= threshold:
+                matches.append((self._plates[best_index], score))
+            else:
+                matches.append((None, 0.0))
+        return matches
+
+    def best_match(self, text: str, confidence_percent: float):
+        """Single-candidate form of best_matches(), same interface as PlateWhitelistIndex."""
+        return self.best_matches([text], confidence_percent)[0]
+
+
 def is_string_similar_to_any_in_list(
-    text_to_compare: str, string_list: list[str], confidence_percent: int
+    text_to_compare: str, string_list, confidence_percent: int
 ) -> bool:
     """
     Checks if text_to_compare is similar to any string in string_list
@@ -537,7 +1008,9 @@ def is_string_similar_to_any_in_list(
 
     Args:
         text_to_compare (str): The string to check.
-        string_list (list[str]): A list of strings to compare against.
+        string_list (list[str] | PlateWhitelistIndex | VectorizedPlateMatcher):
+            Strings to compare against. Passing a prebuilt matcher avoids
+            scanning the whole list in Python.
         confidence_percent (int): The similarity confidence threshold (0-100).
 
     Returns:
@@ -546,6 +1019,10 @@ def is_string_similar_to_any_in_list(
     if not string_list or not isinstance(text_to_compare, str):
         return False
 
+    if isinstance(string_list, (PlateWhitelistIndex, VectorizedPlateMatcher)):
+        matched_plate, _ = string_list.best_match(text_to_compare, confidence_percent)
+        return matched_plate is not None
+
     # Normalize confidence from 0-100 to 0.0-1.0
     normalized_confidence_threshold = confidence_percent / 100.0
 
@@ -554,9 +1031,6 @@ def is_string_similar_to_any_in_list(
             continue  # Skip non-string items in the list
 
         similarity = calculate_similarity_score(text_to_compare, candidate_string)
-        print(
-            f"similarity: {similarity}, candidate_string: {candidate_string}, text_to_compare: {text_to_compare}"
-        )
         # For debugging, you can uncomment the line below:
         # print(f"Comparing '{text_to_compare}' with '{candidate_string}': Similarity = {similarity:.4f}, Threshold = {normalized_confidence_threshold:.2f}")
 
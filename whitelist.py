@@ -0,0 +1,125 @@
+"""
+白名单文件的读取与热加载。
+
+支持的格式:
+    CSV / TXT: 每行第一列为车牌，# 开头的行为注释，可选表头 (plate / license_number)
+    YAML:      车牌列表，或 {plates: [...]}，列表项可以是字符串或 {plate: ...}
+
+WhitelistWatcher 轮询文件的修改时间，文件变化后重新读取并回调，
+不需要重启进程；读取失败时保留当前白名单。
+"""
+
+import asyncio
+import csv
+import os
+
+import yaml
+
+from util import normalize_plate_text
+
+_HEADER_NAMES = {"plate", "plates", "license_number", "license_plate"}
+
+
+def _entries_from_yaml(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or []
+    if isinstance(data, dict):
+        data = data.get("plates") or []
+    if not isinstance(data, list):
+        raise ValueError("YAML 白名单必须是车牌列表或包含 plates 列表")
+    entries = []
+    for item in data:
+        if isinstance(item, dict):
+            item = item.get("plate")
+        if item is not None:
+            entries.append(str(item))
+    return entries
+
+
+def _entries_from_csv(path):
+    entries = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+                continue
+            entries.append(row[0])
+    if entries and entries[0].strip().lower() in _HEADER_NAMES:
+        entries = entries[1:]
+    return entries
+
+
+def load_whitelist_file(path: str) -> list:
+    """读取白名单文件，返回规范化 (去掉分隔符、转大写) 并去重后的车牌列表。"""
+    if path.lower().endswith((".yaml", ".yml")):
+        entries = _entries_from_yaml(path)
+    else:
+        entries = _entries_from_csv(path)
+    plates = []
+    seen = set()
+    for entry in entries:
+        plate = normalize_plate_text(entry.strip()).upper()
+        if plate and plate not in seen:
+            seen.add(plate)
+            plates.append(plate)
+    return plates
+
+
+class WhitelistWatcher:
+    """
+    轮询白名单文件，(mtime, size) 变化时在线程池中重新读取并调用 on_reload(plates)。
+    on_reload 在事件循环中调用，也可以是协程函数。
+    """
+
+    def __init__(self, path: str, on_reload, interval: float = 2.0):
+        self.path = path
+        self.on_reload = on_reload
+        self.interval = interval
+        self._signature = None
+        self._task = None
+
+    def _current_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def check(self) -> bool:
+        """文件变化时重新加载，返回是否加载了新的白名单。"""
+        signature = self._current_signature()
+        if signature is None or signature == self._signature:
+            return False
+        loop = asyncio.get_running_loop()
+        try:
+            plates = await loop.run_in_executor(None, load_whitelist_file, self.path)
+        except Exception as e:
+            print(f"错误: 无法读取白名单文件 '{self.path}': {e}，继续使用当前白名单。")
+            # 记录签名，文件再次修改前不重复报错
+            self._signature = signature
+            return False
+        self._signature = signature
+        result = self.on_reload(plates)
+        if asyncio.iscoroutine(result):
+            await result
+        return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"错误: 重新加载白名单时发生异常: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="whitelist-watcher")
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None